@@ -1,5 +1,9 @@
 import ftplib
 import os
+import socket
+import select
+import asyncio
+import threading
 from datetime import datetime
 from ..constants import DEFAULT_FTP_PORT, DEFAULT_TIMEOUT
 from ..exceptions import RemoteConnectionError, NetworkError
@@ -8,14 +12,163 @@ from ..utils.logging_config import get_logger
 
 logger = get_logger(__name__)
 
+# aioftp is optional - only needed for FTPClientAsync
+try:
+    import aioftp
+    HAS_AIOFTP = True
+except ImportError:
+    aioftp = None
+    HAS_AIOFTP = False
+
+# Shared event loop for running FTPClientAsync coroutines from sync code
+_loop = None
+_loop_lock = threading.Lock()
+
+# Download tuning: socket read size and local write buffer
+DOWNLOAD_BLOCK_SIZE = 64 * 1024
+DOWNLOAD_WRITE_BUFFER = 1024 * 1024
+
+# os.splice (Linux, Python 3.10+) moves data channel bytes to the file in-kernel
+HAS_SPLICE = hasattr(os, 'splice')
+
+def _splice_download(sock, fd, timeout=None, chunk=DOWNLOAD_BLOCK_SIZE):
+    """Copy a socket into a file descriptor through a pipe, without userspace copies
+    
+    Returns False if the first splice fails (file systems such as FUSE or
+    CIFS reject it); any bytes already taken off the socket are written to
+    fd, so the caller can finish the transfer with _recv_into_download.
+    """
+    pipe_r, pipe_w = os.pipe()
+    sock_fd = sock.fileno()
+    first = True
+    try:
+        while True:
+            try:
+                n = os.splice(sock_fd, pipe_w, chunk)
+            except BlockingIOError:
+                # Sockets with a timeout are non-blocking underneath
+                if not select.select([sock_fd], [], [], timeout)[0]:
+                    raise TimeoutError("Data connection timed out")
+                continue
+            except OSError:
+                if first:
+                    return False
+                raise
+            if n == 0:
+                break
+            if first:
+                first = False
+                try:
+                    n -= os.splice(pipe_r, fd, n)
+                except OSError:
+                    # Move what is already in the pipe the slow way
+                    while n:
+                        data = os.read(pipe_r, n)
+                        n -= len(data)
+                        os.write(fd, data)
+                    return False
+            while n:
+                n -= os.splice(pipe_r, fd, n)
+        return True
+    finally:
+        os.close(pipe_r)
+        os.close(pipe_w)
+
+def _recv_into_download(sock, f, chunk=DOWNLOAD_BLOCK_SIZE):
+    """Copy a socket into a file through one preallocated, reused buffer"""
+    buf = bytearray(chunk)
+    view = memoryview(buf)
+    recv_into = sock.recv_into
+    write = f.write
+    while True:
+        n = recv_into(buf)
+        if not n:
+            break
+        write(view[:n])
+
+def tune_socket(sock):
+    """Disable Nagle and enable keepalive (best effort)
+    
+    Buffer sizes are left to the kernel: setting SO_RCVBUF after connect
+    disables Linux receive autotuning and cannot change the window scale.
+    """
+    options = (
+        (socket.IPPROTO_TCP, socket.TCP_NODELAY, 1),
+        (socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1),
+    )
+    
+    for level, option, value in options:
+        try:
+            sock.setsockopt(level, option, value)
+        except OSError:
+            pass
+
+class _TunedFTP(ftplib.FTP):
+    """ftplib.FTP that tunes data connections and skips redundant TYPE commands
+    
+    ftplib sends TYPE A/TYPE I before every transfer; when the server is
+    already in that mode the extra round trip is dropped.
+    """
+    
+    _type = None
+    
+    def _skip_type(self, cmd):
+        if cmd in ('TYPE A', 'TYPE I'):
+            if cmd == self._type:
+                return True
+            self._type = cmd
+        elif cmd.startswith(('TYPE', 'USER', 'REIN')):
+            # Unknown or reset transfer mode
+            self._type = None
+        return False
+    
+    def sendcmd(self, cmd):
+        if self._skip_type(cmd):
+            return '200 Type unchanged'
+        return super().sendcmd(cmd)
+    
+    def voidcmd(self, cmd):
+        if self._skip_type(cmd):
+            return '200 Type unchanged'
+        return super().voidcmd(cmd)
+    
+    def ntransfercmd(self, cmd, rest=None):
+        conn, size = super().ntransfercmd(cmd, rest)
+        tune_socket(conn)
+        return conn, size
+
+# Month abbreviations used by Unix-style LIST output
+_MONTHS = {
+    'Jan': 1, 'Feb': 2, 'Mar': 3, 'Apr': 4, 'May': 5, 'Jun': 6,
+    'Jul': 7, 'Aug': 8, 'Sep': 9, 'Oct': 10, 'Nov': 11, 'Dec': 12
+}
+
+def _parse_mlsd_time(s):
+    """Parse MLSD modify fact (YYYYMMDDhhmmss[.sss]) without strptime"""
+    return datetime(int(s[0:4]), int(s[4:6]), int(s[6:8]),
+                    int(s[8:10]), int(s[10:12]), int(s[12:14]))
+
+def _parse_dir_time(month, day, clock, year):
+    """Parse LIST date columns ("Jan", "1", "00:00") without strptime"""
+    hour, minute = clock.split(':')
+    return datetime(year, _MONTHS[month.capitalize()], int(day), int(hour), int(minute))
+
 class FTPClient:
     def __init__(self, config):
         self.config = config
         self.connection = None
         self.timeout = DEFAULT_TIMEOUT
+        # Cleared once a server is seen to mishandle pipelined commands
+        self.pipelining = True
+        # Cleared once the server rejects MLSD as an unknown command
+        self.mlsd_supported = True
     
-    def connect(self, host, port=DEFAULT_FTP_PORT, username="anonymous", password="", timeout=None):
-        """Connect to FTP server"""
+    def connect(self, host, port=DEFAULT_FTP_PORT, username="anonymous", password="", timeout=None, after_connect=None):
+        """Connect to FTP server
+        
+        after_connect, if given, is called with the control socket once
+        the TCP connection is up (default tuning is applied first).
+        """
         try:
             validate_hostname(host)
             validate_port(port)
@@ -23,8 +176,12 @@ class FTPClient:
             if timeout is None:
                 timeout = self.timeout
             
-            self.connection = ftplib.FTP()
+            self.connection = _TunedFTP()
+            self.mlsd_supported = True
             self.connection.connect(host, port, timeout=timeout)
+            tune_socket(self.connection.sock)
+            if after_connect:
+                after_connect(self.connection.sock)
             self.connection.login(username, password)
             
             return True, "Connected successfully"
@@ -100,41 +257,47 @@ class FTPClient:
             if not self.is_connected():
                 raise RemoteConnectionError("Not connected to FTP server")
             
-            # Try MLSD first (structured listing)
-            try:
-                entries = []
-                for name, facts in self.connection.mlsd(path):
-                    if name in ['.', '..']:
-                        continue
+            # Hoisted out of the per-entry loops
+            _join = os.path.join
+            _is_root = (path == '/')
+            
+            # Try MLSD first (structured listing) unless the server lacks it
+            if self.mlsd_supported:
+                try:
+                    entries = []
+                    for name, facts in self.connection.mlsd(path):
+                        if name in ['.', '..']:
+                            continue
+                        
+                        is_dir = facts.get('type', '').lower() == 'dir'
+                        size = int(facts.get('size', 0))
+                        
+                        # Parse modify time if available
+                        date = None
+                        if 'modify' in facts:
+                            try:
+                                # Format: YYYYMMDDhhmmss
+                                date = _parse_mlsd_time(facts['modify'])
+                            except Exception:
+                                pass
+                        
+                        entries.append({
+                            'name': name,
+                            'path': ('/' + name) if _is_root else _join(path, name),
+                            'is_dir': is_dir,
+                            'is_link': False,
+                            'size': size,
+                            'permissions': facts.get('unix.mode', ''),
+                            'date': date
+                        })
                     
-                    is_dir = facts.get('type', '').lower() == 'dir'
-                    size = int(facts.get('size', 0))
+                    return entries
                     
-                    # Parse modify time if available
-                    date = None
-                    if 'modify' in facts:
-                        try:
-                            # Format: YYYYMMDDhhmmss
-                            date_str = facts['modify']
-                            date = datetime.strptime(date_str, "%Y%m%d%H%M%S")
-                        except Exception:
-                            pass
-                    
-                    entries.append({
-                        'name': name,
-                        'path': os.path.join(path, name) if path != '/' else '/' + name,
-                        'is_dir': is_dir,
-                        'is_link': False,
-                        'size': size,
-                        'permissions': facts.get('unix.mode', ''),
-                        'date': date
-                    })
-                
-                return entries
-                
-            except (ftplib.error_perm, AttributeError):
-                # MLSD not supported, fall back to DIR
-                pass
+                except (ftplib.error_perm, AttributeError) as e:
+                    # MLSD not supported, fall back to DIR; remember
+                    # "command unknown" so later listings skip the attempt
+                    if str(e)[:3] in ('500', '502'):
+                        self.mlsd_supported = False
             
             # Fallback: Use DIR command
             if path and path != "/":
@@ -145,6 +308,7 @@ class FTPClient:
             self.connection.dir(lines.append)
             
             # Parse directory listing
+            _year = datetime.now().year
             entries = []
             for line in lines:
                 try:
@@ -165,25 +329,21 @@ class FTPClient:
                         except (ValueError, IndexError):
                             pass
                         
-                        # Try to extract date
-                        date_str = ' '.join(parts[5:8])
+                        # Try to extract date (current year implied)
                         date = None
                         try:
-                            date = datetime.strptime(date_str, "%b %d %H:%M")
-                            # Add current year
-                            date = date.replace(year=datetime.now().year)
+                            date = _parse_dir_time(parts[5], parts[6], parts[7], _year)
                         except Exception:
                             pass
                         
                         entries.append({
                             'name': name,
-                            'path': os.path.join(path, name) if path != '/' else '/' + name,
+                            'path': ('/' + name) if _is_root else _join(path, name),
                             'is_dir': is_dir,
                             'is_link': is_link,
                             'size': size,
                             'permissions': permissions,
-                            'date': date,
-                            'full_line': line
+                            'date': date
                         })
                 except Exception as parse_error:
                     logger.warning(f"Failed to parse FTP listing line: {parse_error}")
@@ -196,6 +356,21 @@ class FTPClient:
         except Exception as e:
             raise RemoteConnectionError(f"List directory failed: {e}")
     
+    def list_directory_raw(self, path="/"):
+        """Return the raw LIST lines for a directory (for debugging)"""
+        try:
+            if not self.is_connected():
+                raise RemoteConnectionError("Not connected to FTP server")
+            
+            lines = []
+            self.connection.dir(path, lines.append)
+            return lines
+            
+        except ftplib.error_perm as e:
+            raise RemoteConnectionError(f"Permission denied: {e}")
+        except Exception as e:
+            raise RemoteConnectionError(f"List directory failed: {e}")
+    
     def download_file(self, remote_path, local_path):
         """Download file from FTP server"""
         try:
@@ -204,12 +379,26 @@ class FTPClient:
             
             # Create local directory if it doesn't exist
             local_dir = os.path.dirname(local_path)
-            if local_dir and not os.path.exists(local_dir):
+            if local_dir:
                 os.makedirs(local_dir, exist_ok=True)
             
-            # Download file
-            with open(local_path, 'wb') as f:
-                self.connection.retrbinary(f'RETR {remote_path}', f.write)
+            try:
+                # Large write buffer to batch syscalls on the recv_into path
+                with open(local_path, 'wb', buffering=DOWNLOAD_WRITE_BUFFER) as f:
+                    self.connection.voidcmd('TYPE I')
+                    with self.connection.transfercmd(f'RETR {remote_path}') as conn:
+                        # Zero-copy (data socket -> pipe -> file) when the target allows it,
+                        # otherwise one reused receive buffer
+                        if not (HAS_SPLICE and _splice_download(conn, f.fileno(), conn.gettimeout())):
+                            _recv_into_download(conn, f)
+                    self.connection.voidresp()
+            except Exception:
+                # Don't leave a truncated file behind
+                try:
+                    os.remove(local_path)
+                except OSError:
+                    pass
+                raise
             
             return True, f"Downloaded: {remote_path}"
             
@@ -321,3 +510,286 @@ class FTPClient:
             
         except Exception as e:
             raise RemoteConnectionError(f"Get file size failed: {e}")
+    
+    def _read_stat_reply(self, parse):
+        """Read one SIZE/MDTM reply; None if the server has no answer for it"""
+        try:
+            resp = self.connection.getresp()
+        except (ftplib.error_perm, ftplib.error_temp):
+            return None
+        if not resp.startswith('213'):
+            return None
+        try:
+            return parse(resp[3:].strip())
+        except ValueError:
+            return None
+    
+    def _send_stat(self, paths):
+        """Send SIZE and MDTM for each path in a single write"""
+        # Same check ftplib's putline applies: a newline would inject commands
+        for path in paths:
+            if '\r' in path or '\n' in path:
+                raise ValueError(f"Illegal newline character in path: {path!r}")
+        commands = ''.join(f"SIZE {path}\r\nMDTM {path}\r\n" for path in paths)
+        self.connection.sock.sendall(commands.encode(self.connection.encoding))
+    
+    def _read_stat(self, paths, results):
+        for path in paths:
+            results[path] = {
+                'size': self._read_stat_reply(int),
+                'date': self._read_stat_reply(_parse_mlsd_time)
+            }
+    
+    def _resync(self, max_replies=4):
+        """Drain replies still pending on the control channel
+        
+        A NOOP is sent and replies are read until its 200 arrives; if it
+        does not, the connection is dropped rather than left out of step.
+        """
+        try:
+            self.connection.putcmd('NOOP')
+            for _ in range(max_replies):
+                if self.connection.getmultiline().startswith('200'):
+                    return
+        except (OSError, EOFError):
+            pass
+        self.connection.close()
+        self.connection = None
+        raise RemoteConnectionError("FTP control channel out of sync, reconnect required")
+    
+    def batch_stat(self, paths, chunk_size=50):
+        """Get size and modification time for many files
+        
+        SIZE/MDTM commands are pipelined so a whole chunk costs one round
+        trip. Servers that garble pipelined replies are detected on the
+        first file and handled one command at a time from then on.
+        
+        Returns {path: {'size': int or None, 'date': datetime or None}}
+        """
+        try:
+            if not self.is_connected():
+                raise RemoteConnectionError("Not connected to FTP server")
+            
+            results = {}
+            if not paths:
+                return results
+            
+            # SIZE is only reliable in binary mode
+            self.connection.voidcmd('TYPE I')
+            
+            start = 0
+            if self.pipelining:
+                # Probe with the first file
+                try:
+                    self._send_stat(paths[:1])
+                    self._read_stat(paths[:1], results)
+                    start = 1
+                except (ftplib.error_proto, ftplib.error_reply, EOFError):
+                    logger.warning("FTP server rejected pipelined commands, using serial SIZE/MDTM")
+                    self.pipelining = False
+                    self._resync()
+            
+            for i in range(start, len(paths), chunk_size if self.pipelining else 1):
+                if self.pipelining:
+                    chunk = paths[i:i + chunk_size]
+                    self._send_stat(chunk)
+                    self._read_stat(chunk, results)
+                else:
+                    path = paths[i]
+                    self.connection.putcmd(f"SIZE {path}")
+                    size = self._read_stat_reply(int)
+                    self.connection.putcmd(f"MDTM {path}")
+                    results[path] = {'size': size, 'date': self._read_stat_reply(_parse_mlsd_time)}
+            
+            return results
+            
+        except RemoteConnectionError:
+            raise
+        except Exception as e:
+            raise RemoteConnectionError(f"Batch stat failed: {e}")
+
+
+def _get_loop():
+    """Return the shared background event loop, starting it on first use"""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            thread = threading.Thread(target=_loop.run_forever, name="wgfm-ftp-loop")
+            thread.daemon = True
+            thread.start()
+        return _loop
+
+def run_async(coro, timeout=None):
+    """Run coroutine on the shared loop and block for its result"""
+    future = asyncio.run_coroutine_threadsafe(coro, _get_loop())
+    return future.result(timeout)
+
+
+class FTPClientAsync:
+    """Asynchronous FTP client backed by aioftp
+
+    Independent operations can be combined with asyncio.gather; sync
+    callers can drive coroutines through run_async().
+    """
+
+    def __init__(self, config, max_connections=8):
+        if not HAS_AIOFTP:
+            raise RemoteConnectionError("aioftp not installed. Install: pip install aioftp")
+        self.config = config
+        self.connection = None
+        self.timeout = DEFAULT_TIMEOUT
+        self.max_connections = max_connections
+        self._credentials = None
+
+    async def _open(self, host, port, username, password, timeout):
+        """Open and log in a new aioftp client"""
+        client = aioftp.Client(socket_timeout=timeout)
+        try:
+            await client.connect(host, port)
+            await client.login(username, password)
+        except aioftp.StatusCodeError as e:
+            client.close()
+            raise RemoteConnectionError(f"Authentication failed: {e}")
+        except ConnectionRefusedError:
+            client.close()
+            raise NetworkError(f"Connection refused to {host}:{port}")
+        except (TimeoutError, asyncio.TimeoutError):
+            client.close()
+            raise NetworkError(f"Connection timeout to {host}:{port}")
+        except Exception as e:
+            client.close()
+            raise RemoteConnectionError(f"FTP connection failed: {e}")
+        return client
+
+    async def connect(self, host, port=DEFAULT_FTP_PORT, username="anonymous", password="", timeout=None):
+        """Connect to FTP server"""
+        if not validate_hostname(host):
+            raise RemoteConnectionError(f"Invalid host: {host}")
+        if not validate_port(port):
+            raise RemoteConnectionError(f"Invalid port: {port}")
+
+        if timeout is None:
+            timeout = self.timeout
+
+        self.connection = await self._open(host, port, username, password, timeout)
+        self._credentials = (host, port, username, password, timeout)
+        return True, "Connected successfully"
+
+    async def disconnect(self):
+        """Disconnect from FTP server"""
+        if not self.connection:
+            return True
+
+        try:
+            await self.connection.quit()
+            return True
+        except Exception as e:
+            logger.warning(f"Error during quit: {e}")
+            return False
+        finally:
+            self.connection.close()
+            self.connection = None
+
+    def is_connected(self):
+        """Check if a control connection is open"""
+        return self.connection is not None
+
+    @staticmethod
+    def _to_entry(path, name, info):
+        """Convert an aioftp stat dict to the FTPClient entry format"""
+        date = None
+        if 'modify' in info:
+            try:
+                date = _parse_mlsd_time(info['modify'])
+            except Exception:
+                pass
+
+        return {
+            'name': name,
+            'path': os.path.join(path, name) if path != '/' else '/' + name,
+            'is_dir': info.get('type', '').lower() == 'dir',
+            'is_link': False,
+            'size': int(info.get('size', 0)),
+            'permissions': info.get('unix.mode', ''),
+            'date': date
+        }
+
+    async def _list(self, client, path):
+        entries = []
+        for item, info in await client.list(path):
+            name = item.name
+            if name in ['.', '..']:
+                continue
+            entries.append(self._to_entry(path, name, info))
+        return entries
+
+    async def list_directory(self, path="/"):
+        """List directory contents"""
+        if not self.is_connected():
+            raise RemoteConnectionError("Not connected to FTP server")
+
+        try:
+            return await self._list(self.connection, path)
+        except aioftp.StatusCodeError as e:
+            raise RemoteConnectionError(f"Permission denied: {e}")
+        except Exception as e:
+            raise RemoteConnectionError(f"List directory failed: {e}")
+
+    async def list_directories(self, paths):
+        """List several directories concurrently
+
+        FTP allows one transfer per control connection, so each listing
+        runs on its own connection (bounded by max_connections).
+        Returns {path: entries or exception}.
+        """
+        if not self._credentials:
+            raise RemoteConnectionError("Not connected to FTP server")
+
+        semaphore = asyncio.Semaphore(self.max_connections)
+
+        async def list_one(path):
+            async with semaphore:
+                client = await self._open(*self._credentials)
+                try:
+                    return await self._list(client, path)
+                finally:
+                    client.close()
+
+        results = await asyncio.gather(*[list_one(p) for p in paths], return_exceptions=True)
+        return dict(zip(paths, results))
+
+    async def download_file(self, remote_path, local_path):
+        """Download file from FTP server"""
+        if not self.is_connected():
+            raise RemoteConnectionError("Not connected to FTP server")
+
+        try:
+            local_dir = os.path.dirname(local_path)
+            if local_dir:
+                os.makedirs(local_dir, exist_ok=True)
+
+            await self.connection.download(remote_path, local_path, write_into=True)
+            return True, f"Downloaded: {remote_path}"
+
+        except aioftp.StatusCodeError as e:
+            raise RemoteConnectionError(f"Permission denied: {e}")
+        except Exception as e:
+            raise RemoteConnectionError(f"Download failed: {e}")
+
+    async def upload_file(self, local_path, remote_path):
+        """Upload file to FTP server"""
+        if not self.is_connected():
+            raise RemoteConnectionError("Not connected to FTP server")
+
+        if not os.path.exists(local_path):
+            raise RemoteConnectionError(f"Local file not found: {local_path}")
+
+        try:
+            await self.connection.upload(local_path, remote_path, write_into=True)
+            return True, f"Uploaded: {remote_path}"
+
+        except aioftp.StatusCodeError as e:
+            raise RemoteConnectionError(f"Permission denied: {e}")
+        except Exception as e:
+            raise RemoteConnectionError(f"Upload failed: {e}")
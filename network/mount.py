@@ -2,12 +2,117 @@ import subprocess
 import os
 import time
 import tempfile
+import threading
+import socket
+import selectors
+import errno
 import shlex
 from ..constants import DEFAULT_CIFS_VERSION, DEFAULT_TIMEOUT
 from ..exceptions import NetworkError, RemoteConnectionError
 from ..utils.validators import validate_ip, validate_hostname, sanitize_string
 import re
 
+# Ports tried by test_ping: SMB first, then common services (HTTP, DNS, SSH)
+PROBE_PORTS = (445, 139, 80, 53, 22)
+
+_MOUNT_ESCAPE = re.compile(r'\\([0-7]{3})')
+
+def _unescape_mount(field):
+    """Decode octal escapes (e.g. \\040 for space) used in mountinfo fields"""
+    if '\\' not in field:
+        return field
+    return _MOUNT_ESCAPE.sub(lambda m: chr(int(m.group(1), 8)), field)
+
+def iter_smbclient_shares(cmd, status, timeout=15):
+    """Run an 'smbclient -L -g' command, yielding each disk share as it arrives
+    
+    stderr is merged into stdout so neither pipe can fill up and stall.
+    Once exhausted, status holds 'returncode' and up to 20 lines of other
+    'output'. Raises subprocess.TimeoutExpired if smbclient hangs.
+    """
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                            text=True, bufsize=1)
+    killed = []
+    
+    def kill():
+        killed.append(True)
+        proc.kill()
+    
+    timer = threading.Timer(timeout, kill)
+    timer.daemon = True
+    timer.start()
+    other = []
+    try:
+        for line in proc.stdout:
+            # -g output: Disk|name|comment
+            if line.startswith('Disk|'):
+                parts = line.rstrip('\n').split('|')
+                share_name = parts[1]
+                if share_name and not share_name.endswith('$'):
+                    yield {
+                        'name': share_name,
+                        'type': 'Disk',
+                        'description': parts[2] if len(parts) > 2 else ''
+                    }
+            elif len(other) < 20:
+                other.append(line.strip())
+        proc.wait()
+    finally:
+        timer.cancel()
+        if proc.poll() is None:
+            proc.kill()
+            proc.wait()
+        proc.stdout.close()
+    if killed:
+        raise subprocess.TimeoutExpired(cmd, timeout)
+    status['returncode'] = proc.returncode
+    status['output'] = [line for line in other if line]
+
+def connect_many(targets, timeout=1.0, ok_errors=(0,), first_only=False):
+    """Start a non-blocking connect to every (ip, port) at once; returns the set that answered.
+    
+    A target answers when its connect ends with an errno in ok_errors (add
+    ECONNREFUSED to detect live hosts). One selector watches every in-flight
+    connect, so the whole batch is bounded by a single timeout and all
+    sockets are torn down together at the end. With first_only the batch
+    stops at the first answer.
+    """
+    sel = selectors.DefaultSelector()
+    connected = set()
+    try:
+        for target in targets:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sock.setblocking(False)
+            err = sock.connect_ex(target)
+            if err in ok_errors:
+                connected.add(target)
+                sock.close()
+                if first_only:
+                    return connected
+            elif err in (errno.EINPROGRESS, errno.EWOULDBLOCK):
+                sel.register(sock, selectors.EVENT_WRITE, target)
+            else:
+                sock.close()
+        
+        deadline = time.monotonic() + timeout
+        while sel.get_map():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            for key, _ in sel.select(remaining):
+                sock = key.fileobj
+                if sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR) in ok_errors:
+                    connected.add(key.data)
+                sel.unregister(sock)
+                sock.close()
+            if first_only and connected:
+                break
+    finally:
+        for key in list(sel.get_map().values()):
+            key.fileobj.close()
+        sel.close()
+    return connected
+
 class MountManager:
     def __init__(self, config):
         self.config = config
@@ -31,8 +136,7 @@ class MountManager:
                 return False, "Mount point must be absolute path"
             
             # Create mount point if it doesn't exist
-            if not os.path.exists(mount_point):
-                os.makedirs(mount_point, exist_ok=True)
+            os.makedirs(mount_point, exist_ok=True)
             
             # Unmount first if already mounted
             self.umount(mount_point, force=True)
@@ -41,25 +145,23 @@ class MountManager:
             mount_options = []
             
             # SECURITY FIX: Use credentials file instead of command line
+            # Written once and kept for all version attempts
             if username:
                 creds_fd, creds_file = tempfile.mkstemp(prefix='wgfilemanager_', suffix='.creds', dir='/tmp')
-                try:
-                    with os.fdopen(creds_fd, 'w') as f:
-                        f.write(f"username={username}\n")
-                        if password:
-                            f.write(f"password={password}\n")
-                        if domain:
-                            f.write(f"domain={domain}\n")
-                    # Secure permissions (owner read/write only)
-                    os.chmod(creds_file, 0o600)
-                    mount_options.append(f"credentials={creds_file}")
-                except Exception:
-                    if creds_file and os.path.exists(creds_file):
-                        os.unlink(creds_file)
-                    raise
+                with os.fdopen(creds_fd, 'w') as f:
+                    f.write(f"username={username}\n")
+                    if password:
+                        f.write(f"password={password}\n")
+                    if domain:
+                        f.write(f"domain={domain}\n")
+                # Secure permissions (owner read/write only)
+                os.chmod(creds_file, 0o600)
+                mount_options.append(f"credentials={creds_file}")
             else:
                 mount_options.append("guest")
             
+            # Only the vers= element changes between attempts
+            vers_index = len(mount_options)
             mount_options.append(f"vers={DEFAULT_CIFS_VERSION}")
             mount_options.append("rw")
             mount_options.append("iocharset=utf8")
@@ -71,97 +173,60 @@ class MountManager:
                 elif isinstance(options, str):
                     mount_options.append(options)
             
-            # Build mount command with proper quoting
-            mount_cmd = [
-                "mount", "-t", "cifs",
-                f"//{server}/{share}",
-                mount_point,
-                "-o", ",".join(mount_options)
-            ]
-            
-            result = subprocess.run(
-                mount_cmd,
-                capture_output=True,
-                timeout=self.timeout,
-                text=True
-            )
-            
-            # Clean up credentials file
-            if creds_file and os.path.exists(creds_file):
-                os.unlink(creds_file)
-                creds_file = None
+            # Try the default CIFS version first, then older ones
+            versions = [DEFAULT_CIFS_VERSION] + [v for v in ["3.0", "2.0", "1.0"] if v != DEFAULT_CIFS_VERSION]
+            error = ""
             
-            if result.returncode == 0:
-                self.mount_points[mount_point] = {
-                    'type': 'cifs',
-                    'server': server,
-                    'share': share,
-                    'options': mount_options
-                }
-                return True, f"Mounted //{server}/{share} to {mount_point}"
-            else:
-                error = result.stderr.strip() or result.stdout.strip()
+            for attempt, version in enumerate(versions):
+                mount_options[vers_index] = f"vers={version}"
                 
-                # Try different CIFS versions
-                for version in ["2.0", "1.0"]:
-                    # Recreate credentials file if needed
-                    if username:
-                        creds_fd, creds_file = tempfile.mkstemp(prefix='wgfilemanager_', suffix='.creds', dir='/tmp')
-                        with os.fdopen(creds_fd, 'w') as f:
-                            f.write(f"username={username}\n")
-                            if password:
-                                f.write(f"password={password}\n")
-                            if domain:
-                                f.write(f"domain={domain}\n")
-                        os.chmod(creds_file, 0o600)
-                    
-                    # Update version in options
-                    new_options = [opt if not opt.startswith('vers=') else f'vers={version}' for opt in mount_options]
-                    mount_cmd = [
-                        "mount", "-t", "cifs",
-                        f"//{server}/{share}",
-                        mount_point,
-                        "-o", ",".join(new_options)
-                    ]
-                    
-                    result = subprocess.run(
-                        mount_cmd,
-                        capture_output=True,
-                        timeout=self.timeout,
-                        text=True
-                    )
-                    
-                    # Clean up credentials file
-                    if creds_file and os.path.exists(creds_file):
-                        os.unlink(creds_file)
-                        creds_file = None
-                    
-                    if result.returncode == 0:
-                        self.mount_points[mount_point] = {
-                            'type': 'cifs',
-                            'server': server,
-                            'share': share,
-                            'options': new_options
-                        }
-                        return True, f"Mounted with vers={version}"
+                # Build mount command with proper quoting
+                mount_cmd = [
+                    "mount", "-t", "cifs",
+                    f"//{server}/{share}",
+                    mount_point,
+                    "-o", ",".join(mount_options)
+                ]
                 
-                return False, f"Mount failed: {error[:200]}"
+                result = subprocess.run(
+                    mount_cmd,
+                    capture_output=True,
+                    timeout=self.timeout,
+                    text=True
+                )
+                
+                if result.returncode == 0:
+                    self.mount_points[mount_point] = {
+                        'type': 'cifs',
+                        'server': server,
+                        'share': share,
+                        'options': list(mount_options)
+                    }
+                    if attempt == 0:
+                        return True, f"Mounted //{server}/{share} to {mount_point}"
+                    return True, f"Mounted with vers={version}"
+                
+                # Report the error from the preferred version
+                if attempt == 0:
+                    error = result.stderr.strip() or result.stdout.strip()
+            
+            return False, f"Mount failed: {error[:200]}"
                 
         except subprocess.TimeoutExpired:
-            if creds_file and os.path.exists(creds_file):
-                os.unlink(creds_file)
             return False, "Mount operation timed out"
         except Exception as e:
+            return False, f"Mount error: {e}"
+        finally:
+            # Clean up credentials file
             if creds_file and os.path.exists(creds_file):
                 os.unlink(creds_file)
-            return False, f"Mount error: {e}"
     
     def umount(self, mount_point, force=False, lazy=False):
         """Unmount filesystem"""
         try:
             sanitize_string(mount_point)
             
-            if not os.path.ismount(mount_point):
+            if not self.is_mounted(mount_point):
                 return True, f"{mount_point} is not mounted"
             
             # Build umount command
@@ -192,24 +257,38 @@ class MountManager:
         except Exception as e:
             return False, f"Unmount error: {e}"
     
+    @staticmethod
+    def _read_mountinfo():
+        """Read mount table from /proc/self/mountinfo"""
+        with open('/proc/self/mountinfo', 'rb') as f:
+            data = f.read().decode('utf-8', 'replace')
+        
+        mounts = []
+        for line in data.splitlines():
+            fields = line.split()
+            # mountinfo: id parent dev root target options [optional...] - fstype source super_options
+            try:
+                sep = fields.index('-', 6)
+            except ValueError:
+                continue
+            if len(fields) < sep + 3:
+                continue
+            mounts.append({
+                'source': _unescape_mount(fields[sep + 2]),
+                'target': _unescape_mount(fields[4]),
+                'fstype': fields[sep + 1],
+                'options': fields[5]
+            })
+        return mounts
+    
     def list_mounts(self):
         """List all mounts"""
         try:
-            result = subprocess.run(
-                ["mount"],
-                capture_output=True,
-                timeout=5,
-                text=True
-            )
-            
-            if result.returncode == 0:
-                mounts = []
-                for line in result.stdout.strip().split('\n'):
-                    if line:
-                        mounts.append(line)
-                return True, mounts
-            else:
-                return False, "Failed to list mounts"
+            mounts = []
+            for mount in self._read_mountinfo():
+                # Same layout as the output of "mount"
+                mounts.append(f"{mount['source']} on {mount['target']} type {mount['fstype']} ({mount['options']})")
+            return True, mounts
                 
         except Exception as e:
             return False, f"List mounts error: {e}"
@@ -217,40 +296,24 @@ class MountManager:
     def is_mounted(self, mount_point):
         """Check if path is mounted"""
         try:
-            return os.path.ismount(mount_point)
+            target = os.path.normpath(mount_point)
+            return any(mount['target'] == target for mount in self._read_mountinfo())
         except:
-            return False
+            try:
+                return os.path.ismount(mount_point)
+            except:
+                return False
     
     def get_mount_info(self, mount_point):
         """Get information about mount"""
         try:
-            result = subprocess.run(
-                ["findmnt", "-o", "SOURCE,TARGET,FSTYPE,OPTIONS", mount_point],
-                capture_output=True,
-                timeout=5,
-                text=True
-            )
-            
-            if result.returncode == 0 and "TARGET" not in result.stdout:
-                lines = result.stdout.strip().split('\n')
-                if len(lines) > 1:
-                    parts = lines[1].split()
-                    if len(parts) >= 4:
-                        return {
-                            'source': parts[0],
-                            'target': parts[1],
-                            'fstype': parts[2],
-                            'options': parts[3] if len(parts) > 3 else ""
-                        }
-            
-            # Fallback to mount command
-            success, mounts = self.list_mounts()
-            if success:
-                for mount in mounts:
-                    if mount_point in mount:
-                        return {'raw': mount}
-            
-            return None
+            target = os.path.normpath(mount_point)
+            info = None
+            # Last entry wins when mounts are stacked on the same target
+            for mount in self._read_mountinfo():
+                if mount['target'] == target:
+                    info = mount
+            return info
             
         except:
             return None
@@ -275,73 +338,62 @@ class MountManager:
             if smb_check.returncode != 0:
                 return False, "smbclient not installed. Install: opkg install samba-client"
             
-            # Try anonymous listing first
-            result = subprocess.run(
-                ["smbclient", "-L", server, "-N", "-g"],
-                capture_output=True,
-                timeout=15,
-                text=True
-            )
-            
-            if result.returncode != 0:
-                # Try with guest
-                result = subprocess.run(
-                    ["smbclient", "-L", server, "-U", "guest%", "-g"],
-                    capture_output=True,
-                    timeout=15,
-                    text=True
-                )
-            
-            if result.returncode == 0:
-                shares = []
-                lines = result.stdout.split("\n")
-                
-                for line in lines:
-                    if '|Disk|' in line:
-                        parts = line.split('|')
-                        if len(parts) >= 2:
-                            share_name = parts[1]
-                            if share_name and not share_name.endswith('$'):
-                                shares.append({
-                                    'name': share_name,
-                                    'type': 'Disk',
-                                    'description': parts[2] if len(parts) > 2 else ''
-                                })
-                
-                if shares:
-                    return True, shares
-                else:
-                    return False, "No shares found on %s. Server may require authentication." % server
+            shares = list(self.iter_network_shares(server))
+            if shares:
+                return True, shares
             else:
-                error = result.stderr[:200] if result.stderr else "Connection refused"
-                return False, "Scan failed: %s. Try: Check IP, firewall, SMB enabled on server." % error
+                return False, "No shares found on %s. Server may require authentication." % server
                 
+        except NetworkError as e:
+            return False, "Scan failed: %s. Try: Check IP, firewall, SMB enabled on server." % e
         except subprocess.TimeoutExpired:
             return False, "Scan timed out. Server may be slow or unreachable."
         except Exception as e:
             return False, "Scan error: %s" % str(e)
     
+    def iter_network_shares(self, server, timeout=15):
+        """Yield disk shares as smbclient -L reports them
+        
+        Tries an anonymous listing, then guest. Raises NetworkError if
+        both fail and subprocess.TimeoutExpired if smbclient hangs.
+        """
+        error = ""
+        for cmd in (["smbclient", "-L", server, "-N", "-g"],
+                    ["smbclient", "-L", server, "-U", "guest%", "-g"]):
+            status = {}
+            found = False
+            for share in iter_smbclient_shares(cmd, status, timeout):
+                found = True
+                yield share
+            
+            if status['returncode'] == 0 or found:
+                return
+            error = " ".join(status['output'])
+        
+        raise NetworkError(error[:200] or "Connection refused")
+    
 
-    def test_ping(self, host):
-        """Ping host to test connectivity"""
+    def test_ping(self, host, timeout=1):
+        """Test connectivity with a TCP connect probe (no ping fork)
+        
+        SMB ports are tried first, then common service ports. A refused
+        connection still proves the host is up.
+        """
         try:
             if not validate_ip(host) and not validate_hostname(host):
                 return False, f"Invalid host: {host}"
             
-            result = subprocess.run(
-                ["ping", "-c", "2", "-W", "2", host],
-                capture_output=True,
-                timeout=5,
-                text=True
-            )
+            address = socket.gethostbyname(host)
             
-            if result.returncode == 0:
-                return True, "Ping successful"
-            else:
-                return False, "Host unreachable"
+            # Start all connects at once so the whole probe costs one timeout;
+            # a refused connection still proves the host is up
+            if connect_many([(address, port) for port in PROBE_PORTS], timeout,
+                            (0, errno.ECONNREFUSED), first_only=True):
+                return True, "Host reachable"
+            return False, "Host unreachable"
                 
-        except subprocess.TimeoutExpired:
-            return False, "Ping timeout"
+        except socket.gaierror:
+            return False, f"Cannot resolve host: {host}"
         except Exception as e:
             return False, f"Ping error: {e}"
     
@@ -377,26 +429,44 @@ class MountManager:
         
         return list(set(mount_points))
     
+    def _probe_mounts(self, mount_points, timeout=2):
+        """Probe mount points concurrently; return those that did not answer in time"""
+        alive = set()
+        
+        def probe(mount_point):
+            try:
+                os.statvfs(mount_point)
+                alive.add(mount_point)
+            except OSError:
+                pass
+        
+        # Daemon threads: a probe stuck on a dead server must not block exit
+        threads = []
+        for mount_point in mount_points:
+            thread = threading.Thread(target=probe, args=(mount_point,), daemon=True)
+            thread.start()
+            threads.append(thread)
+        
+        deadline = time.time() + timeout
+        for thread in threads:
+            thread.join(max(0, deadline - time.time()))
+        
+        return [mp for mp in mount_points if mp not in alive]
+    
     def cleanup_mounts(self):
         """Cleanup stale mounts"""
         try:
-            success, mounts = self.list_mounts()
-            if not success:
-                return False, "Failed to list mounts"
+            network_mounts = [
+                mount['target'] for mount in self._read_mountinfo()
+                if "//" in mount['source'] or ":" in mount['source']
+            ]
             
             cleaned = 0
-            for mount in mounts:
-                if "//" in mount or ":" in mount:
-                    parts = mount.split()
-                    if len(parts) >= 3:
-                        mount_point = parts[2]
-                        try:
-                            os.listdir(mount_point)
-                        except:
-                            self.umount(mount_point, force=True, lazy=True)
-                            cleaned += 1
+            for mount_point in self._probe_mounts(network_mounts):
+                self.umount(mount_point, force=True, lazy=True)
+                cleaned += 1
             
             return True, f"Cleaned {cleaned} stale mounts"
             
         except Exception as e:
-            return False, f"Cleanup mounts error: {e}"
\ No newline at end of file
+            return False, f"Cleanup mounts error: {e}"
@@ -2,139 +2,357 @@
 Network Browser - Enables browsing remote filesystems in dual-pane view
 """
 import os
+import re
+import sys
+import time
+import threading
+import functools
+from collections import namedtuple
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor
 from Components.config import config 
 from ..exceptions import RemoteConnectionError
+from ..utils.listing_cache import ListingCache
+
+# Network path parsing: protocol, user, host, port, path
+_NET_RE = re.compile(r'^(ftp|sftp|webdav)://(?:([^@/]*)@)?([^:/]*)(?::(\d+))?(/.*)?$', re.S)
+_NET_PREFIXES = ('ftp://', 'sftp://', 'webdav://')
+_DEFAULT_PORTS = {'ftp': 21, 'sftp': 22, 'webdav': 80}
+
+# Directory listing cache. NetworkBrowser never writes to the servers, so writes
+# made through the protocol clients show up once an entry expires; callers that
+# need a fresh listing pass use_cache=False or call clear_cache()
+LISTING_CACHE_SIZE = 128
+LISTING_CACHE_TTL = 30  # seconds
+
+# WebDAV background prefetch of child folders
+PREFETCH_MAX_CHILDREN = 8
+PREFETCH_CONCURRENCY = 4
+
+# Settings cached from config.plugins.wgfilemanager
+_WATCHED_SETTINGS = ('ftp_pass', 'sftp_pass', 'webdav_user', 'webdav_pass', 'webdav_url')
+
+# Entries per on_chunk() call in list_directory_streaming
+STREAM_CHUNK_SIZE = 50
+
+# Pooled connections idle longer than this are closed
+CONNECTION_IDLE_TIMEOUT = 120  # seconds
+
+def _plugin_config():
+    """Return the Enigma2 settings subtree for this plugin"""
+    return config.plugins.wgfilemanager
+
+# Parsed form of proto://[user@]host[:port]/path
+ParsedNetPath = namedtuple('ParsedNetPath', 'protocol host port username path')
+
+@functools.lru_cache(maxsize=4096)
+def _parse_network_path_cached(path):
+    m = _NET_RE.match(path)
+    if not m:
+        return None
+    
+    protocol, username, host, port, remote_path = m.groups()
+    return ParsedNetPath(protocol, host, int(port) if port else _DEFAULT_PORTS[protocol],
+                         username, remote_path or '/')
+
+class Entry:
+    """Directory entry returned by NetworkBrowser.list_directory
+    
+    Slotted to keep large listings small; item access (entry['name'],
+    entry.get('date')) is kept for code written against the old dicts.
+    """
+    __slots__ = ('name', 'path', 'is_dir', 'size', 'date')
+    
+    def __init__(self, name, path, is_dir, size, date=None):
+        self.name = name
+        self.path = path
+        self.is_dir = is_dir
+        self.size = size
+        self.date = date
+    
+    def __getitem__(self, key):
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key)
+    
+    def get(self, key, default=None):
+        return getattr(self, key, default)
+    
+    def __repr__(self):
+        return f"Entry({self.name!r}, {self.path!r}, is_dir={self.is_dir}, size={self.size})"
+
+def _to_entries(network_path, entries):
+    """Convert client entry dicts to Entry objects under network_path"""
+    # One shared prefix string; each path is built by a single format
+    base = sys.intern(network_path.rstrip('/') + '/')
+    return [Entry(e['name'], f'{base}{e["name"]}', e['is_dir'], e.get('size', 0), e.get('date'))
+            for e in entries]
 
 class NetworkBrowser:
     """Browse network locations as if they were local"""
     
     def __init__(self, config):
         self.config = config
+        # Plugin settings subtree, resolved once
+        self._cfg = _plugin_config()
+        # Connection settings, kept current by config notifiers
+        self._settings = {}
+        # (config element, notifier) pairs, removed again by close_all()
+        self._notifiers = []
+        for name in _WATCHED_SETTINGS:
+            element = getattr(self._cfg, name)
+            notifier = functools.partial(self._on_setting_change, name)
+            element.addNotifier(notifier, initial_call=True)
+            self._notifiers.append((element, notifier))
+        # (protocol, host, port, username) -> {'client', 'lock', 'last_used'}
         self.active_connections = {}
+        self._pool_lock = threading.Lock()
         self.mount_points = {}
+        # (protocol, host, port, username, path) -> (timestamp, entries)
+        self._listing_cache = ListingCache(LISTING_CACHE_SIZE, LISTING_CACHE_TTL)
+        self._prefetch_slots = threading.Semaphore(PREFETCH_CONCURRENCY)
+        # (scheme, host, port) -> HTTPConnectionPool for WebDAV
+        self._http_sessions = {}
+    
+    def _on_setting_change(self, name, element):
+        value = element.value
+        if name == 'webdav_url':
+            # Paths are appended with a leading '/'
+            value = value.rstrip('/')
+        self._settings[name] = value
     
     def is_network_path(self, path):
         """Check if path is a network location"""
-        return path.startswith('ftp://') or path.startswith('sftp://') or path.startswith('webdav://')
+        # Local paths (the common case) start with '/' or '.'; bail on the first char
+        if not path or path[0] in '/.':
+            return False
+        return path.startswith(_NET_PREFIXES)
     
     def parse_network_path(self, path):
-        """Parse network path into components"""
-        if path.startswith('ftp://'):
-            protocol = 'ftp'
-            path = path[6:]
-        elif path.startswith('sftp://'):
-            protocol = 'sftp'
-            path = path[7:]
-        elif path.startswith('webdav://'):
-            protocol = 'webdav'
-            path = path[9:]
-        else:
-            return None
-        
-        # Parse user@host:port/path
-        parts = path.split('/', 1)
-        host_part = parts[0]
-        remote_path = '/' + parts[1] if len(parts) > 1 else '/'
-        
-        # Parse user@host:port
-        if '@' in host_part:
-            user_host = host_part.split('@')
-            username = user_host[0]
-            host_port = user_host[1]
-        else:
-            username = None
-            host_port = host_part
+        """Parse network path (proto://[user@]host[:port]/path) into a ParsedNetPath"""
+        return _parse_network_path_cached(path)
+    
+    def _get_connection(self, parsed, client_factory):
+        """Return the pooled connection for a server, creating it on first use
         
-        if ':' in host_port:
-            host, port = host_port.split(':')
-            port = int(port)
-        else:
-            host = host_port
-            port = 21 if protocol == 'ftp' else (22 if protocol == 'sftp' else 80)
-        
-        return {
-            'protocol': protocol,
-            'host': host,
-            'port': port,
-            'username': username,
-            'path': remote_path
-        }
-    
-    def list_directory(self, network_path, ftp_client, sftp_client, webdav_client):
-        """List directory on network location"""
+        The entry's lock must be held while using the client.
+        """
+        self.close_idle()
+        key = parsed[:4]
+        with self._pool_lock:
+            conn = self.active_connections.get(key)
+            if conn is None:
+                conn = {'client': client_factory(), 'lock': threading.Lock(), 'last_used': 0}
+                self.active_connections[key] = conn
+            conn['last_used'] = time.monotonic()
+        return conn
+    
+    def _new_ftp_client(self):
+        """Create an FTP client owned by the connection pool"""
+        from .ftp_client import FTPClient
+        return FTPClient(self.config)
+    
+    def close_idle(self, max_age=CONNECTION_IDLE_TIMEOUT):
+        """Disconnect pooled connections unused for max_age seconds"""
+        now = time.monotonic()
+        idle = []
+        with self._pool_lock:
+            for key, conn in list(self.active_connections.items()):
+                # Skip connections that are busy right now
+                if now - conn['last_used'] >= max_age and conn['lock'].acquire(False):
+                    del self.active_connections[key]
+                    idle.append(conn)
+        
+        for conn in idle:
+            try:
+                conn['client'].disconnect()
+            except Exception:
+                pass
+            finally:
+                conn['lock'].release()
+        return len(idle)
+    
+    def remove_notifiers(self):
+        """Unregister the config notifiers so this browser can be freed"""
+        notifiers, self._notifiers = self._notifiers, []
+        for element, notifier in notifiers:
+            try:
+                element.removeNotifier(notifier)
+            except ValueError:
+                pass
+    
+    def close_all(self):
+        """Disconnect every pooled connection and stop tracking settings"""
+        self.remove_notifiers()
+        with self._pool_lock:
+            sessions, self._http_sessions = self._http_sessions, {}
+        for session in sessions.values():
+            session.close()
+        return self.close_idle(0)
+    
+    def _webdav_session(self, url):
+        """Return the shared keep-alive connection pool for a WebDAV URL"""
+        from .webdav_client import HTTPConnectionPool
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.hostname, parts.port)
+        with self._pool_lock:
+            session = self._http_sessions.get(key)
+            if session is None:
+                session = HTTPConnectionPool(parts.scheme, parts.hostname, parts.port)
+                self._http_sessions[key] = session
+        return session
+    
+    def _cache_key(self, parsed):
+        return parsed._replace(path=parsed.path.rstrip('/') or '/')
+    
+    def clear_cache(self):
+        """Drop all cached listings"""
+        self._listing_cache.clear()
+    
+    def list_directory(self, network_path, ftp_client, sftp_client, webdav_client, use_cache=True):
+        """List directory on network location
+        
+        Cached listings may be up to LISTING_CACHE_TTL seconds old.
+        """
         parsed = self.parse_network_path(network_path)
         if not parsed:
             raise RemoteConnectionError("Invalid network path: " + network_path)
         
-        protocol = parsed['protocol']
-        host = parsed['host']
-        port = parsed['port']
-        path = parsed['path']
-        username = parsed.get('username', 'anonymous')
+        key = self._cache_key(parsed)
+        if use_cache:
+            cached = self._listing_cache.get(key)
+            if cached is not None:
+                return cached
+        
+        result = self._fetch_directory(network_path, parsed, ftp_client, sftp_client, webdav_client)
+        self._listing_cache.set(key, result)
+        
+        # Warm the cache for folders the user is likely to open next
+        if parsed.protocol == 'webdav':
+            self._prefetch_children(result, webdav_client)
+        return result
+    
+    def list_directory_streaming(self, network_path, on_chunk, ftp_client, sftp_client, webdav_client,
+                                 chunk_size=STREAM_CHUNK_SIZE):
+        """List directory, passing entries to on_chunk(entries) as they arrive
+        
+        SFTP listings are streamed from the ssh process so the UI can paint
+        the first rows before the rest has been received; other protocols
+        are delivered in chunks once fetched. Run from a worker thread.
+        Returns the full listing, which is also cached.
+        """
+        parsed = self.parse_network_path(network_path)
+        if not parsed:
+            raise RemoteConnectionError("Invalid network path: " + network_path)
+        
+        key = self._cache_key(parsed)
+        result = self._listing_cache.get(key)
+        
+        if result is None and parsed.protocol == 'sftp':
+            result = []
+            pending = []
+            password = self._settings['sftp_pass']
+            for entry in sftp_client.iter_directory(parsed.host, parsed.port, parsed.username, password, parsed.path):
+                pending.append(entry)
+                if len(pending) >= chunk_size:
+                    entries = _to_entries(network_path, pending)
+                    result.extend(entries)
+                    on_chunk(entries)
+                    pending = []
+            if pending:
+                entries = _to_entries(network_path, pending)
+                result.extend(entries)
+                on_chunk(entries)
+            self._listing_cache.set(key, result)
+            return result
+        
+        if result is None:
+            result = self.list_directory(network_path, ftp_client, sftp_client, webdav_client, use_cache=False)
+        for i in range(0, len(result), chunk_size):
+            on_chunk(result[i:i + chunk_size])
+        return result
+    
+    def _prefetch_children(self, entries, webdav_client):
+        """Fetch child folder listings into the cache in the background"""
+        def prefetch(child_path):
+            with self._prefetch_slots:
+                parsed = self.parse_network_path(child_path)
+                key = self._cache_key(parsed)
+                if key in self._listing_cache:
+                    return
+                try:
+                    result = self._fetch_directory(child_path, parsed, None, None, webdav_client)
+                    self._listing_cache.set(key, result)
+                except Exception:
+                    pass
+        
+        children = [e.path for e in entries if e.is_dir][:PREFETCH_MAX_CHILDREN]
+        for child_path in children:
+            threading.Thread(target=prefetch, args=(child_path,), daemon=True).start()
+    
+    def _fetch_directory(self, network_path, parsed, ftp_client, sftp_client, webdav_client):
+        """List directory from the server, bypassing the cache"""
+        protocol = parsed.protocol
+        host = parsed.host
+        port = parsed.port
+        path = parsed.path
+        username = parsed.username
         
         # Get password from config if available
+        settings = self._settings
         if protocol == 'ftp':
-            password = config.plugins.wgfilemanager.ftp_pass.value
-            client = ftp_client
-            
-            # Connect if not connected
-            if not client.is_connected():
-                client.connect(host, port, username, password)
-            
-            # List directory
-            entries = client.list_directory(path)
+            password = settings['ftp_pass']
+            conn = self._get_connection(parsed, self._new_ftp_client)
             
-            # Convert to standard format
-            result = []
-            for entry in entries:
-                result.append({
-                    'name': entry['name'],
-                    'path': network_path.rstrip('/') + '/' + entry['name'],
-                    'is_dir': entry['is_dir'],
-                    'size': entry['size'],
-                    'date': entry.get('date'),
-                })
-            return result
+            with conn['lock']:
+                client = conn['client']
+                # Connect if not connected
+                if not client.is_connected():
+                    client.connect(host, port, username, password)
+                
+                # List directory
+                entries = client.list_directory(path)
             
         elif protocol == 'sftp':
-            password = config.plugins.wgfilemanager.sftp_pass.value
+            password = settings['sftp_pass']
             success, entries = sftp_client.list_directory(host, port, username, password, path)
             
             if not success:
                 raise RemoteConnectionError("SFTP list failed: " + str(entries))
             
-            result = []
-            for entry in entries:
-                result.append({
-                    'name': entry['name'],
-                    'path': network_path.rstrip('/') + '/' + entry['name'],
-                    'is_dir': entry['is_dir'],
-                    'size': entry['size'],
-                })
-            return result
-            
         elif protocol == 'webdav':
-            password = config.plugins.wgfilemanager.webdav_pass.value
-            username = config.plugins.wgfilemanager.webdav_user.value
-            url = config.plugins.wgfilemanager.webdav_url.value + path
+            password = settings['webdav_pass']
+            username = settings['webdav_user']
+            url = settings['webdav_url'] + path
             
-            success, entries = webdav_client.list_directory(url, username, password)
+            success, entries = webdav_client.list_directory(url, username, password,
+                                                            session=self._webdav_session(url))
             
             if not success:
                 raise RemoteConnectionError("WebDAV list failed: " + str(entries))
-            
-            result = []
-            for entry in entries:
-                result.append({
-                    'name': entry['name'],
-                    'path': network_path.rstrip('/') + '/' + entry['name'],
-                    'is_dir': entry['is_dir'],
-                    'size': entry.get('size', 0),
-                })
-            return result
         
         else:
             raise RemoteConnectionError("Unsupported protocol: " + protocol)
+        
+        # Convert to standard format
+        return _to_entries(network_path, entries)
+    
+    def list_many(self, network_paths, ftp_client, sftp_client, webdav_client, max_workers=4):
+        """List several network locations concurrently (e.g. both panes)
+        
+        Returns {network_path: entries or exception}; wall time is roughly
+        the slowest listing instead of the sum of all of them.
+        """
+        def list_one(network_path):
+            try:
+                return self.list_directory(network_path, ftp_client, sftp_client, webdav_client)
+            except Exception as e:
+                return e
+        
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(list_one, network_paths))
+        return dict(zip(network_paths, results))
     
     def download_file(self, network_path, local_path, ftp_client, sftp_client, webdav_client):
         """Download file from network location"""
@@ -142,27 +360,56 @@ class NetworkBrowser:
         if not parsed:
             raise RemoteConnectionError("Invalid network path")
         
-        protocol = parsed['protocol']
-        host = parsed['host']
-        port = parsed['port']
-        path = parsed['path']
-        username = parsed.get('username', 'anonymous')
+        return self._download_parsed(parsed, local_path, ftp_client, sftp_client, webdav_client)
+    
+    def download_many(self, entries, local_dir, ftp_client, sftp_client, webdav_client, max_workers=8):
+        """Download listing entries into local_dir concurrently
+        
+        Returns {network_path: (success, message)}. Downloads from the same
+        FTP server share its pooled connection and run one at a time.
+        """
+        def download_one(entry):
+            parsed = self.parse_network_path(entry['path'])
+            if not parsed:
+                return False, "Invalid network path"
+            try:
+                return self._download_parsed(parsed, os.path.join(local_dir, entry['name']),
+                                             ftp_client, sftp_client, webdav_client)
+            except Exception as e:
+                return False, f"Download error: {e}"
+        
+        files = [entry for entry in entries if not entry['is_dir']]
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(download_one, files))
+        return dict(zip([entry['path'] for entry in files], results))
+    
+    def _download_parsed(self, parsed, local_path, ftp_client, sftp_client, webdav_client):
+        """Download an already parsed network path"""
+        protocol = parsed.protocol
+        host = parsed.host
+        port = parsed.port
+        path = parsed.path
+        username = parsed.username
         
+        settings = self._settings
         if protocol == 'ftp':
-            password = config.plugins.wgfilemanager.ftp_pass.value
-            if not ftp_client.is_connected():
-                ftp_client.connect(host, port, username, password)
-            success, msg = ftp_client.download_file(path, local_path)
+            password = settings['ftp_pass']
+            conn = self._get_connection(parsed, self._new_ftp_client)
+            with conn['lock']:
+                client = conn['client']
+                if not client.is_connected():
+                    client.connect(host, port, username, password)
+                success, msg = client.download_file(path, local_path)
             return success, msg
             
         elif protocol == 'sftp':
-            password = config.plugins.wgfilemanager.sftp_pass.value
+            password = settings['sftp_pass']
             return sftp_client.download_file(host, port, username, password, path, local_path)
             
         elif protocol == 'webdav':
-            password = config.plugins.wgfilemanager.webdav_pass.value
-            username = config.plugins.wgfilemanager.webdav_user.value
-            url = config.plugins.wgfilemanager.webdav_url.value + path
+            password = settings['webdav_pass']
+            username = settings['webdav_user']
+            url = settings['webdav_url'] + path
             return webdav_client.download_file(url, local_path, username, password)
         
         else:
@@ -0,0 +1,236 @@
+"""
+Async Network Browser - asyncio-native counterpart of NetworkBrowser
+
+Uses aioftp, asyncssh and aiohttp when they are installed; protocols
+whose library is missing fall back to the blocking clients run in the
+default executor. Results have the same shape as NetworkBrowser
+(lists of Entry), so sync callers can swap in via asyncio.run().
+"""
+import asyncio
+import os
+from ..exceptions import RemoteConnectionError
+from .network_browser import NetworkBrowser, _to_entries
+from .ftp_client import FTPClientAsync, HAS_AIOFTP
+from .webdav_client import WebDAVClient
+
+try:
+    import asyncssh
+except ImportError:
+    asyncssh = None
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+class AsyncNetworkBrowser:
+    """Browse network locations with asyncio"""
+
+    def __init__(self, config, ftp_client=None, sftp_client=None, webdav_client=None):
+        self.config = config
+        self.browser = NetworkBrowser(config)
+        # Blocking clients used when the async library is not installed
+        self.clients = (ftp_client, sftp_client, webdav_client)
+        # Shared aiohttp session and (host, port, username) -> asyncssh
+        # connection, bound to the loop they were opened on
+        self._loop = None
+        self._http = None
+        self._ssh = {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+    def close(self):
+        """Release the wrapped NetworkBrowser (config notifiers, pooled FTP connections)"""
+        self.browser.close_all()
+
+    async def aclose(self):
+        """Close the aiohttp session and SSH connections, then the NetworkBrowser"""
+        http, self._http = self._http, None
+        connections, self._ssh = list(self._ssh.values()), {}
+        if http is not None:
+            await http.close()
+        for conn in connections:
+            conn.close()
+            await conn.wait_closed()
+        self.close()
+
+    def _bind_loop(self):
+        """Forget sessions opened on a previous event loop (e.g. an earlier asyncio.run)"""
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._loop = loop
+            self._http = None
+            self._ssh = {}
+
+    def _http_session(self):
+        self._bind_loop()
+        if self._http is None or self._http.closed:
+            self._http = aiohttp.ClientSession()
+        return self._http
+
+    async def _ssh_connection(self, host, port, username):
+        self._bind_loop()
+        key = (host, port, username)
+        conn = self._ssh.get(key)
+        if conn is None:
+            conn = await asyncssh.connect(host, port=port, username=username,
+                                          password=self.browser._settings['sftp_pass'], known_hosts=None)
+            self._ssh[key] = conn
+        return conn
+
+    def _drop_ssh(self, host, port, username):
+        """Discard a cached SSH connection after an error"""
+        conn = self._ssh.pop((host, port, username), None)
+        if conn is not None:
+            conn.close()
+
+    def _parse(self, network_path):
+        parsed = self.browser.parse_network_path(network_path)
+        if not parsed:
+            raise RemoteConnectionError("Invalid network path: " + network_path)
+        return parsed
+
+    async def _run_sync(self, func, *args):
+        if not all(self.clients):
+            raise RemoteConnectionError("Async library missing and no blocking clients given")
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, func, *args, *self.clients)
+
+    async def _ftp_connect(self, host, port, username):
+        """Open an FTPClientAsync on the running loop"""
+        client = FTPClientAsync(self.config)
+        await client.connect(host, port, username or 'anonymous', self.browser._settings['ftp_pass'])
+        return client
+
+    async def list_directory(self, network_path):
+        """List directory on network location"""
+        parsed = self._parse(network_path)
+        protocol = parsed.protocol
+        host = parsed.host
+        port = parsed.port
+        path = parsed.path
+        username = parsed.username
+        settings = self.browser._settings
+
+        try:
+            if protocol == 'ftp':
+                if not HAS_AIOFTP:
+                    return await self._run_sync(self.browser.list_directory, network_path)
+
+                client = await self._ftp_connect(host, port, username)
+                try:
+                    entries = await client.list_directory(path)
+                finally:
+                    await client.disconnect()
+
+            elif protocol == 'sftp':
+                if asyncssh is None:
+                    return await self._run_sync(self.browser.list_directory, network_path)
+
+                entries = []
+                conn = await self._ssh_connection(host, port, username)
+                try:
+                    async with conn.start_sftp_client() as sftp:
+                        for name in await sftp.readdir(path):
+                            if name.filename in ('.', '..'):
+                                continue
+                            entries.append({
+                                'name': name.filename,
+                                'is_dir': name.attrs.type == asyncssh.FILEXFER_TYPE_DIRECTORY,
+                                'size': name.attrs.size or 0
+                            })
+                except Exception:
+                    self._drop_ssh(host, port, username)
+                    raise
+
+            elif protocol == 'webdav':
+                if aiohttp is None:
+                    return await self._run_sync(self.browser.list_directory, network_path)
+
+                url = settings['webdav_url'] + path
+                username = settings['webdav_user']
+                auth = aiohttp.BasicAuth(username, settings['webdav_pass']) if username else None
+                async with self._http_session().request('PROPFIND', url, headers={'Depth': '1'},
+                                                        auth=auth) as resp:
+                    if resp.status >= 400:
+                        raise RemoteConnectionError(f"WebDAV list failed: HTTP {resp.status}")
+                    body = await resp.read()
+                entries = WebDAVClient._parse_listing(body, url)
+
+            else:
+                raise RemoteConnectionError("Unsupported protocol: " + protocol)
+
+        except RemoteConnectionError:
+            raise
+        except Exception as e:
+            raise RemoteConnectionError(f"{protocol.upper()} list failed: {e}")
+
+        return _to_entries(network_path, entries)
+
+    async def list_many(self, network_paths):
+        """List several locations concurrently; returns {path: entries or exception}"""
+        results = await asyncio.gather(*[self.list_directory(p) for p in network_paths],
+                                       return_exceptions=True)
+        return dict(zip(network_paths, results))
+
+    async def download_file(self, network_path, local_path):
+        """Download file from network location"""
+        parsed = self._parse(network_path)
+        protocol = parsed.protocol
+        host = parsed.host
+        port = parsed.port
+        path = parsed.path
+        username = parsed.username
+        settings = self.browser._settings
+
+        local_dir = os.path.dirname(local_path)
+        if local_dir:
+            os.makedirs(local_dir, exist_ok=True)
+
+        try:
+            if protocol == 'ftp':
+                if not HAS_AIOFTP:
+                    return await self._run_sync(self.browser.download_file, network_path, local_path)
+                client = await self._ftp_connect(host, port, username)
+                try:
+                    await client.download_file(path, local_path)
+                finally:
+                    await client.disconnect()
+
+            elif protocol == 'sftp':
+                if asyncssh is None:
+                    return await self._run_sync(self.browser.download_file, network_path, local_path)
+                conn = await self._ssh_connection(host, port, username)
+                try:
+                    async with conn.start_sftp_client() as sftp:
+                        await sftp.get(path, local_path)
+                except Exception:
+                    self._drop_ssh(host, port, username)
+                    raise
+
+            elif protocol == 'webdav':
+                if aiohttp is None:
+                    return await self._run_sync(self.browser.download_file, network_path, local_path)
+                url = settings['webdav_url'] + path
+                username = settings['webdav_user']
+                auth = aiohttp.BasicAuth(username, settings['webdav_pass']) if username else None
+                async with self._http_session().get(url, auth=auth) as resp:
+                    if resp.status >= 400:
+                        return False, f"Download failed: HTTP {resp.status}"
+                    with open(local_path, 'wb') as f:
+                        async for chunk in resp.content.iter_chunked(64 * 1024):
+                            f.write(chunk)
+
+            else:
+                raise RemoteConnectionError("Unsupported protocol")
+
+        except RemoteConnectionError:
+            raise
+        except Exception as e:
+            return False, f"Download error: {e}"
+
+        return True, f"Downloaded: {path}"
@@ -5,17 +5,29 @@ Professional network scanning and device discovery
 
 from Screens.Screen import Screen
 from Screens.MessageBox import MessageBox
+from Screens.VirtualKeyBoard import VirtualKeyBoard
 from Components.ActionMap import ActionMap
 from Components.Label import Label
 from Components.MenuList import MenuList
 from enigma import getDesktop, eTimer
+import asyncio
 import subprocess
 import threading
+import queue
 import socket
+import select
+import errno
+import fcntl
+import struct
 import re
+import json
 import time
 import os
 import sys
+import tempfile
+import atexit
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from .mount import MountManager, iter_smbclient_shares, connect_many
 
 # Handle imports for both installed and development mode
 try:
@@ -34,6 +46,761 @@ except ImportError:
         logging.basicConfig(level=logging.INFO)
         logger = logging.getLogger(__name__)
 
+# Background jobs run one at a time on a single long-lived worker thread
+_JOBS = queue.Queue()
+_WORKER = None
+_WORKER_LOCK = threading.Lock()
+
+
+def _worker_loop():
+    """Run queued jobs forever, logging instead of dying on errors"""
+    while True:
+        job = _JOBS.get()
+        try:
+            job()
+        except Exception as e:
+            logger.error(f"Network tools job failed: {e}")
+        finally:
+            _JOBS.task_done()
+
+
+def _submit(job):
+    """Queue job for the worker thread, starting it on first use"""
+    global _WORKER
+    with _WORKER_LOCK:
+        if _WORKER is None:
+            _WORKER = threading.Thread(target=_worker_loop, name="NetworkToolsWorker", daemon=True)
+            _WORKER.start()
+    _JOBS.put(job)
+
+
+# SMB scan/browse/mount jobs get their own small pool so a 15s smbclient or
+# mount call never queues behind a network sweep on the tools worker
+_SMB_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix="smb")
+atexit.register(_SMB_POOL.shutdown, wait=False)
+
+# smbclient results: server -> (stamp, shares), (server, share, path) -> (stamp, items)
+_SHARE_CACHE = {}
+_DIR_CACHE = {}
+_SHARE_TTL = 300
+
+# Share list row templates; the truncated description is stored on the share
+# dict as '_disp_desc' so cached shares are not re-sliced on every redraw
+_SHARE_TEMPLATE = "📁 {name:<20}"
+_SHARE_DESC_TEMPLATE = " - {desc}"
+
+
+def _share_row(share):
+    """Return the (label, share) row shown for a share"""
+    desc = share.get('_disp_desc')
+    if desc is None:
+        desc = share['_disp_desc'] = (share.get('description') or '')[:30]
+    display = _SHARE_TEMPLATE.format_map(share)
+    if desc:
+        display += _SHARE_DESC_TEMPLATE.format(desc=desc)
+    return display, share
+
+
+# "  name   DA   0  Mon Jan  1 00:00:00 2024" as printed by smbclient ls; matching
+# from the date backwards keeps names with spaces and skips the summary lines
+_LS_RE = re.compile(r'^\s+(.+?)\s+([A-Z]*)\s+(\d+)\s+\w{3} \w{3}\s+\d+ [\d:]+ \d{4}$', re.M)
+
+
+def _smb_ls_entries(output):
+    """Yield entry dicts from 'smbclient -c ls' output"""
+    for m in _LS_RE.finditer(output):
+        name, attrs, size = m.group(1, 2, 3)
+        if not name.startswith('.'):
+            yield {'name': name, 'is_dir': 'D' in attrs, 'size': size}
+
+
+def _entry_row(entry):
+    """Return the (label, entry) row shown for a directory entry"""
+    return f"{'📁' if entry['is_dir'] else '📄'} {entry['name']}", entry
+
+
+# Mount points from MountManager's mount table, re-read at most every _MOUNTS_TTL seconds
+_MOUNTS_TTL = 5
+_mounts_cache = {"stamp": 0.0, "points": frozenset()}
+
+
+def _is_mounted(mount_point):
+    """Return True if something is already mounted on mount_point"""
+    now = time.monotonic()
+    if now - _mounts_cache["stamp"] >= _MOUNTS_TTL:
+        try:
+            points = frozenset(mount['target'] for mount in MountManager._read_mountinfo())
+        except OSError:
+            points = frozenset()
+        _mounts_cache["points"] = points
+        _mounts_cache["stamp"] = now
+    return os.path.normpath(mount_point) in _mounts_cache["points"]
+
+
+def _forget_mounts():
+    """Invalidate the cached mount table after mounting or unmounting"""
+    _mounts_cache["stamp"] = 0.0
+
+
+def _cache_get(cache, key):
+    """Return the cached value for key if younger than _SHARE_TTL, else None"""
+    entry = cache.get(key)
+    if entry and time.monotonic() - entry[0] < _SHARE_TTL:
+        return entry[1]
+    return None
+
+
+# Favorites are an append-only JSON-lines log: one object per line, deletes
+# are {"server", "share", "deleted": true} tombstones, and the file is only
+# rewritten (compacted) once tombstones exceed a quarter of the live entries
+FAVORITES_FILE = "/tmp/wgfilemanager_smb_favorites.jsonl"
+_LEGACY_FAVORITES_FILE = "/tmp/wgfilemanager_smb_favorites.json"
+
+# Parsed favorites, re-read only when the file's mtime changes; keyset holds
+# their (server, share) pairs for O(1) duplicate checks
+_FAV_CACHE = {"mtime": None, "data": [], "keyset": set(), "tombstones": 0}
+
+
+def _read_favorites():
+    """Replay the favorites log; returns (favorites, tombstone count)"""
+    live = {}
+    tombstones = 0
+    with open(FAVORITES_FILE, 'r') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            key = (entry['server'], entry['share'])
+            if entry.get('deleted'):
+                live.pop(key, None)
+                tombstones += 1
+            else:
+                live[key] = entry
+    return list(live.values()), tombstones
+
+
+def _get_favorites():
+    """Return the saved favorites list (shared; copy before mutating)"""
+    try:
+        mtime = os.stat(FAVORITES_FILE).st_mtime
+    except OSError:
+        mtime = None
+        if os.path.exists(_LEGACY_FAVORITES_FILE):
+            # One-time migration from the old single JSON document
+            with open(_LEGACY_FAVORITES_FILE, 'r') as f:
+                _save_favorites(json.load(f))
+            os.remove(_LEGACY_FAVORITES_FILE)
+            return _FAV_CACHE["data"]
+    if mtime != _FAV_CACHE["mtime"]:
+        data, tombstones = [], 0
+        if mtime is not None:
+            data, tombstones = _read_favorites()
+        _FAV_CACHE["mtime"] = mtime
+        _FAV_CACHE["data"] = data
+        _FAV_CACHE["tombstones"] = tombstones
+        _FAV_CACHE["keyset"] = {(fav['server'], fav['share']) for fav in data}
+    return _FAV_CACHE["data"]
+
+
+def _write_favorites(favorites):
+    """Atomically rewrite the log with just the live favorites (keyset untouched)"""
+    tmp = FAVORITES_FILE + ".tmp"
+    with open(tmp, 'w') as f:
+        f.writelines(json.dumps(fav) + "\n" for fav in favorites)
+    os.replace(tmp, FAVORITES_FILE)
+    _FAV_CACHE["mtime"] = os.stat(FAVORITES_FILE).st_mtime
+    _FAV_CACHE["data"] = favorites
+    _FAV_CACHE["tombstones"] = 0
+
+
+def _append_favorites_log(record):
+    with open(FAVORITES_FILE, 'a') as f:
+        f.write(json.dumps(record) + "\n")
+    _FAV_CACHE["mtime"] = os.stat(FAVORITES_FILE).st_mtime
+
+
+def _save_favorites(favorites):
+    """Replace all saved favorites"""
+    _write_favorites(favorites)
+    _FAV_CACHE["keyset"] = {(fav['server'], fav['share']) for fav in favorites}
+
+
+def _is_favorite(server, share):
+    _get_favorites()
+    return (server, share) in _FAV_CACHE["keyset"]
+
+
+def _add_favorite(entry):
+    """Append one favorite to the log"""
+    favorites = _get_favorites()
+    _append_favorites_log(entry)
+    favorites.append(entry)
+    _FAV_CACHE["keyset"].add((entry['server'], entry['share']))
+
+
+def _remove_favorite(server, share):
+    """Log a tombstone for one favorite, compacting when they pile up"""
+    if not _is_favorite(server, share):
+        return
+    favorites = [f for f in _get_favorites() if not (f['server'] == server and f['share'] == share)]
+    _FAV_CACHE["keyset"].discard((server, share))
+    if (_FAV_CACHE["tombstones"] + 1) * 4 > len(favorites):
+        _write_favorites(favorites)
+    else:
+        _append_favorites_log({'server': server, 'share': share, 'deleted': True})
+        _FAV_CACHE["data"] = favorites
+        _FAV_CACHE["tombstones"] += 1
+
+
+# smbclient errors worth a guest retry; unreachable/refused hosts fail the same way again
+_SMB_AUTH_ERRORS = ("NT_STATUS_ACCESS_DENIED", "NT_STATUS_LOGON_FAILURE")
+
+
+# Server name -> (ip, stamp); SMB tools are handed IPs so they skip their own
+# NetBIOS/DNS lookups
+_NB_CACHE = {}
+_NB_TTL = 600
+_NMB_ANSWER_RE = re.compile(r'^(\d{1,3}(?:\.\d{1,3}){3}) \S+<00>', re.M)
+
+
+def _resolve_host(name):
+    """Resolve an SMB server name to an IPv4 address (name itself if unresolvable)"""
+    now = time.monotonic()
+    entry = _NB_CACHE.get(name)
+    if entry and now - entry[1] < _NB_TTL:
+        return entry[0]
+    
+    try:
+        ip = socket.gethostbyname(name)
+    except OSError:
+        ip = name
+        # Not in DNS/hosts: ask NetBIOS
+        try:
+            result = subprocess.run(["nmblookup", name], capture_output=True, text=True, timeout=5)
+            m = _NMB_ANSWER_RE.search(result.stdout)
+            if m:
+                ip = m.group(1)
+        except (OSError, subprocess.SubprocessError):
+            pass
+    _NB_CACHE[name] = (ip, now)
+    return ip
+
+
+# Native SMB client (pysmb): reusable sessions instead of an smbclient fork +
+# negotiation per listing
+try:
+    from smb.SMBConnection import SMBConnection
+    from smb.base import SharedDevice
+except ImportError:
+    SMBConnection = None
+
+# pysmb connections are not thread-safe, so each worker thread keeps its own
+# sessions (keyed by server) and reuses them without locking the others out
+_SMB_LOCAL = threading.local()
+
+
+def _smb_connection(server, port=None):
+    """Return this thread's session to server, logging in as guest on first use"""
+    conns = _SMB_LOCAL.__dict__.setdefault('conns', {})
+    conn = conns.get(server)
+    if conn is None:
+        port = port or 445
+        conn = SMBConnection('guest', '', 'WGFILEMANAGER', server,
+                             use_ntlm_v2=True, is_direct_tcp=(port == 445))
+        if not conn.connect(server, port, timeout=15):
+            raise OSError(f"SMB login to {server} refused")
+        conns[server] = conn
+    return conn
+
+
+def _drop_smb_connection(server):
+    conn = _SMB_LOCAL.__dict__.get('conns', {}).pop(server, None)
+    if conn:
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+def _native_list_shares(server, port=None):
+    """List disk shares over a pooled pysmb session; None if pysmb is missing or fails"""
+    if SMBConnection is None:
+        return None
+    try:
+        devices = _smb_connection(server, port).listShares(timeout=15)
+        return [{
+            'name': dev.name,
+            'type': 'Disk',
+            'description': dev.comments or '',
+            'server': server
+        } for dev in devices if dev.type == SharedDevice.DISK_TREE and not dev.isSpecial]
+    except Exception as e:
+        logger.debug(f"pysmb share listing of {server} failed: {e}")
+        _drop_smb_connection(server)
+        return None
+
+
+def _native_list_path(server, share, path):
+    """List a share directory over a pooled pysmb session; None if pysmb is missing or fails"""
+    if SMBConnection is None:
+        return None
+    try:
+        files = _smb_connection(server).listPath(share, '/' + path, timeout=15)
+        return [{'name': f.filename, 'is_dir': f.isDirectory, 'size': str(f.file_size)}
+                for f in files if f.filename not in ('.', '..')]
+    except Exception as e:
+        logger.debug(f"pysmb listing of //{server}/{share}/{path} failed: {e}")
+        _drop_smb_connection(server)
+        return None
+
+
+# Trailer smbclient prints after each successful ls; a failed ls prints
+# "NT_STATUS_... listing \path\*" instead, so every ls ends with one of the two
+_LS_SUMMARY_RE = re.compile(r'^\s*\d+ blocks of size \d+\. \d+ blocks available')
+_BROWSE_PREFETCH = 3
+
+
+def _smb_mask(path):
+    """Return the smbclient ls mask for a share-relative 'a/b' path"""
+    return '\\' + path.replace('/', '\\') + ('\\*' if path else '*')
+
+
+def _ls_safe(path):
+    """True if path can be quoted inside smbclient -c, which splits at every ';'"""
+    return '"' not in path and ';' not in path
+
+
+def _smbclient_ls_path(host, share, path, timeout=15):
+    """List one directory by passing it in the service name; returns entries or None.
+    
+    Slower than a batched _smbclient_ls but safe for any directory name.
+    """
+    result = subprocess.run(
+        ["smbclient", f"//{host}/{share}/{path}", "-N", "-c", "ls"],
+        capture_output=True,
+        text=True,
+        timeout=timeout
+    )
+    if result.returncode != 0:
+        return None
+    return list(_smb_ls_entries(result.stdout))
+
+
+def _smbclient_ls(host, share, paths, timeout=15):
+    """List several directories of a share in one smbclient session.
+    
+    Returns {path: entries} for the paths that could be listed.
+    """
+    commands = "; ".join(f'ls "{_smb_mask(path)}"' for path in paths)
+    result = subprocess.run(
+        ["smbclient", f"//{host}/{share}", "-N", "-c", commands],
+        capture_output=True,
+        text=True,
+        timeout=timeout
+    )
+    
+    listings = {}
+    pending = iter(paths)
+    section = []
+    for line in result.stdout.splitlines():
+        failed = 'NT_STATUS_' in line and ' listing ' in line
+        if not failed and not _LS_SUMMARY_RE.match(line):
+            section.append(line)
+            continue
+        path = next(pending, None)
+        if path is None:
+            break
+        # NO_SUCH_FILE is how older servers answer a listing of an empty directory
+        if not failed or 'NT_STATUS_NO_SUCH_FILE' in line:
+            listings[path] = list(_smb_ls_entries("\n".join(section)))
+        section = []
+    return listings
+
+
+def _dir_rows(path, entries):
+    """Return the browser rows for a directory listing"""
+    rows = [_entry_row(entry) for entry in entries]
+    if path:
+        rows.insert(0, ("📂 [..]  (Parent Directory)", {'name': '..', 'is_dir': True}))
+    return rows
+
+
+def _prefetch_dirs(server, share, paths):
+    """List uncached directories of a share into _DIR_CACHE, batching smbclient calls"""
+    paths = [path for path in paths if _cache_get(_DIR_CACHE, (server, share, path)) is None]
+    if not paths:
+        return
+    
+    host = _resolve_host(server)
+    listings = {}
+    for path in paths:
+        entries = _native_list_path(host, share, path)
+        if entries is not None:
+            listings[path] = entries
+    
+    # Quotes and ';' cannot be passed through smbclient -c
+    rest = [path for path in paths if path not in listings and _ls_safe(path)]
+    if rest:
+        listings.update(_smbclient_ls(host, share, rest))
+    
+    now = time.monotonic()
+    for path, entries in listings.items():
+        _DIR_CACHE[(server, share, path)] = (now, _dir_rows(path, entries))
+
+
+def _list_shares(server, port=None, on_progress=None):
+    """List the disk shares of server: native session first, then smbclient.
+    
+    on_progress(count) is called as smbclient reports shares. Raises
+    FileNotFoundError when smbclient is needed but not installed.
+    """
+    host = _resolve_host(server)
+    shares = _native_list_shares(host, port)
+    if shares:
+        return shares
+    
+    shares = []
+    port_args = ["-p", str(port)] if port else []
+    
+    def run(cmd):
+        status = {}
+        for share in iter_smbclient_shares(cmd, status):
+            share['server'] = server
+            shares.append(share)
+            if on_progress:
+                on_progress(len(shares))
+        return status['returncode'], "\n".join(status['output'])
+    
+    returncode, output = run(["smbclient", "-L", host, "-N", "-g"] + port_args)
+    
+    if returncode != 0 and not shares:
+        if any(err in output for err in _SMB_AUTH_ERRORS):
+            # Try with guest credentials
+            run(["smbclient", "-L", host, "-U", "guest%", "-g"] + port_args)
+        else:
+            logger.info(f"smbclient -L {server} failed, not retrying as guest: {output[:100]}")
+    return shares
+
+
+# Share listings started in the background once discovery finishes:
+# server -> Future, so scan_shares waits on them instead of starting over
+_inflight = {}
+_PREFETCH_HOSTS = 3
+_PREFETCH_WAIT = 35
+
+
+def _fetch_shares(server, port=None):
+    """List shares of server into _SHARE_CACHE"""
+    shares = _list_shares(server, port)
+    if shares:
+        _SHARE_CACHE[server] = (time.monotonic(), shares)
+    return shares
+
+
+def _prefetch_shares(server, port=None):
+    """Start listing the shares of server on _SMB_POOL unless cached or running"""
+    future = _inflight.get(server)
+    if (future is not None and not future.done()) or _cache_get(_SHARE_CACHE, server) is not None:
+        return
+    future = _SMB_POOL.submit(_fetch_shares, server, port)
+    _inflight[server] = future
+    future.add_done_callback(lambda f: _inflight.pop(server, None) if _inflight.get(server) is f else None)
+
+
+# Resolution is fixed at runtime: query the desktop once, not per screen
+try:
+    _DESKTOP = getDesktop(0).size()
+    _W, _H = _DESKTOP.width(), _DESKTOP.height()
+except Exception:
+    _W, _H = 1280, 720
+
+ARP_TABLE = "/proc/net/arp"
+ROUTE_TABLE = "/proc/net/route"
+SIOCGIFADDR = 0x8915
+DEFAULT_BASE_IP = "192.168.100."
+
+# "? (192.168.1.1) at aa:bb:cc:dd:ee:ff [ether] on eth0" as printed by arp -an
+_MAC_RE = re.compile(rb'\(([0-9.]+)\) at ([0-9A-Fa-f]{2}(?::[0-9A-Fa-f]{2}){5})')
+
+
+def _load_arp_table():
+    """Read the kernel ARP table into an {ip: MAC} dict (incomplete entries skipped)"""
+    table = {}
+    try:
+        with open(ARP_TABLE) as f:
+            next(f, None)  # header
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 4 and parts[3] != "00:00:00:00:00:00":
+                    table[parts[0]] = parts[3].upper()
+    except OSError as e:
+        logger.debug(f"ARP table read failed, using arp: {e}")
+        try:
+            result = subprocess.run(["arp", "-an"], capture_output=True, timeout=5)
+            for m in _MAC_RE.finditer(result.stdout):
+                table[m.group(1).decode()] = m.group(2).decode().upper()
+        except (OSError, subprocess.SubprocessError):
+            pass
+    return table
+
+
+def _default_route():
+    """Return (iface, gateway_ip) of the default route from /proc/net/route"""
+    try:
+        with open(ROUTE_TABLE) as f:
+            next(f, None)  # header
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 3 and parts[1] == "00000000":
+                    return parts[0], socket.inet_ntoa(struct.pack('=L', int(parts[2], 16)))  # host byte order
+    except (OSError, ValueError) as e:
+        logger.debug(f"Route table read failed: {e}")
+    return None, None
+
+
+_local_ip_cache = None
+_subnet_cache = None
+
+
+def _local_ip():
+    """Return this box's outgoing IPv4 address, or None if there is no route"""
+    global _local_ip_cache
+    if _local_ip_cache is None:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            # No packet is sent; the kernel just picks the outgoing address
+            sock.connect(("8.8.8.8", 53))
+            _local_ip_cache = sock.getsockname()[0]
+        except OSError:
+            pass
+        finally:
+            sock.close()
+    return _local_ip_cache
+
+
+def _detect_subnet():
+    """Return the /24 prefix ("a.b.c.") of the default interface's IPv4 address"""
+    global _subnet_cache
+    if _subnet_cache is None:
+        base_ip = DEFAULT_BASE_IP
+        own_ip = _local_ip()
+        iface = None if own_ip else _default_route()[0]
+        if own_ip:
+            base_ip = own_ip.rsplit('.', 1)[0] + "."
+        elif iface:
+            # No usable route to probe with; ask the default interface directly
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            try:
+                ifreq = fcntl.ioctl(sock.fileno(), SIOCGIFADDR, struct.pack('256s', iface[:15].encode()))
+                base_ip = socket.inet_ntoa(ifreq[20:24]).rsplit('.', 1)[0] + "."
+            except OSError as e:
+                logger.debug(f"SIOCGIFADDR {iface} failed: {e}")
+            finally:
+                sock.close()
+        _subnet_cache = base_ip
+    return _subnet_cache
+
+
+# Ping sweep: TCP probe ports (a refused connect still proves the host is up)
+SWEEP_PORTS = (80, 445, 22)
+SWEEP_CONCURRENCY = 100
+SWEEP_TIMEOUT = 1.0
+SWEEP_THREADS = 32
+
+
+async def _tcp_alive(ip, port, timeout=SWEEP_TIMEOUT):
+    """Return True if ip answers a TCP connect on port (accept or reset)"""
+    try:
+        _, writer = await asyncio.wait_for(asyncio.open_connection(ip, port), timeout)
+        writer.close()
+        return True
+    except ConnectionRefusedError:
+        return True
+    except (asyncio.TimeoutError, OSError):
+        return False
+
+
+async def _sweep(ips, on_found, is_running):
+    """Probe all ips concurrently, calling on_found(ip) for every live host"""
+    sem = asyncio.Semaphore(SWEEP_CONCURRENCY)
+    
+    async def probe(ip):
+        async with sem:
+            if not is_running():
+                return
+            results = await asyncio.gather(*[_tcp_alive(ip, port) for port in SWEEP_PORTS])
+            if any(results):
+                on_found(ip)
+    
+    await asyncio.gather(*[probe(ip) for ip in ips])
+
+
+def _ping_one(ip, timeout=SWEEP_TIMEOUT):
+    """Blocking TCP probe of ip; returns (ip, ok)"""
+    for port in SWEEP_PORTS:
+        try:
+            socket.create_connection((ip, port), timeout).close()
+            return ip, True
+        except ConnectionRefusedError:
+            return ip, True
+        except OSError:
+            pass
+    return ip, False
+
+
+def _thread_sweep(ips, on_found, is_running):
+    """Thread-pool version of _sweep for Pythons without asyncio.run"""
+    with ThreadPoolExecutor(max_workers=SWEEP_THREADS) as executor:
+        futures = [executor.submit(_ping_one, ip) for ip in ips]
+        for future in as_completed(futures):
+            if not is_running():
+                for pending in futures:
+                    pending.cancel()
+                break
+            ip, ok = future.result()
+            if ok:
+                on_found(ip)
+
+
+def _icmp_checksum(data):
+    """RFC 1071 internet checksum"""
+    if len(data) % 2:
+        data += b'\0'
+    total = sum(struct.unpack(f'!{len(data) // 2}H', data))
+    total = (total >> 16) + (total & 0xffff)
+    total += total >> 16
+    return ~total & 0xffff
+
+
+def _icmp_sweep(ips, on_found, timeout=SWEEP_TIMEOUT):
+    """Ping all ips over a single raw ICMP socket, calling on_found(ip) per reply.
+    
+    Echo requests are sent back-to-back, keyed by (ident, seq), and replies are
+    matched from one select loop. Raises PermissionError without CAP_NET_RAW.
+    """
+    ident = os.getpid() & 0xffff
+    sock = socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_ICMP)
+    pending = {}
+    try:
+        for seq, ip in enumerate(ips):
+            payload = b'wgfm'
+            header = struct.pack('!BBHHH', 8, 0, 0, ident, seq)
+            packet = struct.pack('!BBHHH', 8, 0, _icmp_checksum(header + payload), ident, seq) + payload
+            try:
+                sock.sendto(packet, (ip, 0))
+                pending[seq] = ip
+            except OSError:
+                pass
+        
+        sock.setblocking(False)
+        deadline = time.monotonic() + timeout
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not select.select([sock], [], [], remaining)[0]:
+                break
+            while True:
+                try:
+                    data, addr = sock.recvfrom(1024)
+                except (BlockingIOError, InterruptedError):
+                    break
+                ihl = (data[0] & 0x0f) * 4
+                if len(data) < ihl + 8:
+                    continue
+                icmp_type, _, _, reply_ident, seq = struct.unpack('!BBHHH', data[ihl:ihl + 8])
+                if icmp_type == 0 and reply_ident == ident and pending.get(seq) == addr[0]:
+                    del pending[seq]
+                    on_found(addr[0])
+    finally:
+        sock.close()
+
+
+# NetBIOS Node Status Request for the wildcard name "*" (RFC 1002 4.2.17)
+NBSTAT_QUERY = (b'\xa2\x48\x00\x00\x00\x01\x00\x00\x00\x00\x00\x00'
+                b'\x20CK' + b'A' * 30 + b'\x00\x00\x21\x00\x01')
+NETBIOS_PORT = 137
+
+
+def _parse_nbstat(data):
+    """Return the <20> (file server) name from a Node Status Response, or None"""
+    try:
+        offset = 12
+        if data[offset] & 0xc0 == 0xc0:
+            offset += 2
+        else:
+            while data[offset]:
+                offset += data[offset] + 1
+            offset += 1
+        offset += 10  # type, class, ttl, rdlength
+        count = data[offset]
+        offset += 1
+        for _ in range(count):
+            entry = data[offset:offset + 18]
+            offset += 18
+            # Skip group names; the file server service is a unique <20>
+            if entry[15] == 0x20 and not entry[16] & 0x80:
+                return entry[:15].decode('ascii', 'replace').strip()
+    except IndexError:
+        pass
+    return None
+
+
+def _netbios_scan(ips, broadcast, timeout=2.0):
+    """Send NBSTAT queries over UDP/137 and return [(ip, name)] of SMB file servers.
+    
+    The query is broadcast and also unicast to every ip, since many hosts
+    ignore broadcast node status requests.
+    """
+    found = []
+    seen = set()
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+        for target in [broadcast] + list(ips):
+            try:
+                sock.sendto(NBSTAT_QUERY, (target, NETBIOS_PORT))
+            except OSError:
+                pass
+        
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            sock.settimeout(remaining)
+            try:
+                data, addr = sock.recvfrom(1024)
+            except socket.timeout:
+                break
+            except OSError:
+                continue
+            ip = addr[0]
+            name = _parse_nbstat(data)
+            if name and ip not in seen:
+                seen.add(ip)
+                found.append((ip, name))
+    finally:
+        sock.close()
+    return found
+
+
+def _scan_ports(ip, ports, timeout=1.0):
+    """Connect to all ports at once; returns the open ones in input order"""
+    connected = connect_many([(ip, port) for port in ports], timeout)
+    return [port for port in ports if (ip, port) in connected]
+
+
+_NETWORK_TOOLS_SKIN = f"""
+        <screen name="NetworkToolsScreen" position="0,0" size="{_W},{_H}" backgroundColor="#1a1a1a" flags="wfNoBorder">
+            <eLabel position="0,0" size="{_W},80" backgroundColor="#3a1a5a" />
+            <eLabel text="🌐 Network Tools" position="20,10" size="{_W-40},60" font="Regular;36" halign="center" valign="center" transparent="1" foregroundColor="#ffffff" />
+            
+            <widget name="menu" position="100,120" size="{_W-200},{_H-250}" scrollbarMode="showOnDemand" backgroundColor="#2a2a2a" foregroundColor="#ffffff" selectionBackground="#1976d2" />
+            
+            <eLabel position="0,{_H-120}" size="{_W},120" backgroundColor="#1a1a1a" />
+            <widget name="status" position="20,{_H-110}" size="{_W-40},50" font="Regular;22" halign="center" valign="center" transparent="1" foregroundColor="#00ff00" />
+            <widget name="help" position="20,{_H-55}" size="{_W-40},40" font="Regular;18" halign="center" valign="center" transparent="1" foregroundColor="#aaaaaa" />
+        </screen>"""
+
 
 class NetworkToolsScreen(Screen):
     """Main Network Tools interface"""
@@ -41,21 +808,7 @@ class NetworkToolsScreen(Screen):
     def __init__(self, session):
         Screen.__init__(self, session)
         
-        # Get screen dimensions
-        w, h = getDesktop(0).size().width(), getDesktop(0).size().height()
-        
-        # Create skin
-        self.skin = f"""
-        <screen name="NetworkToolsScreen" position="0,0" size="{w},{h}" backgroundColor="#1a1a1a" flags="wfNoBorder">
-            <eLabel position="0,0" size="{w},80" backgroundColor="#3a1a5a" />
-            <eLabel text="🌐 Network Tools" position="20,10" size="{w-40},60" font="Regular;36" halign="center" valign="center" transparent="1" foregroundColor="#ffffff" />
-            
-            <widget name="menu" position="100,120" size="{w-200},{h-250}" scrollbarMode="showOnDemand" backgroundColor="#2a2a2a" foregroundColor="#ffffff" selectionBackground="#1976d2" />
-            
-            <eLabel position="0,{h-120}" size="{w},120" backgroundColor="#1a1a1a" />
-            <widget name="status" position="20,{h-110}" size="{w-40},50" font="Regular;22" halign="center" valign="center" transparent="1" foregroundColor="#00ff00" />
-            <widget name="help" position="20,{h-55}" size="{w-40},40" font="Regular;18" halign="center" valign="center" transparent="1" foregroundColor="#aaaaaa" />
-        </screen>"""
+        self.skin = _NETWORK_TOOLS_SKIN
         
         # Create widgets
         self["menu"] = MenuList([])
@@ -123,22 +876,30 @@ class NetworkToolsScreen(Screen):
                     ("OpenDNS", "208.67.222.222")
                 ]
                 
-                results = []
-                for name, ip in servers:
+                def ping(server):
+                    name, ip = server
                     result = subprocess.run(
                         ["ping", "-c", "1", "-W", "2", ip],
                         capture_output=True,
                         timeout=3
                     )
-                    status = "✅" if result.returncode == 0 else "❌"
-                    results.append(f"{status} {name} ({ip})")
+                    return name, ip, result.returncode == 0
+                
+                # Ping all servers at once: max(RTT) instead of sum(RTT)
+                results = []
+                any_ok = False
+                with ThreadPoolExecutor(max_workers=len(servers)) as executor:
+                    for name, ip, ok in executor.map(ping, servers):
+                        any_ok |= ok
+                        status = "✅" if ok else "❌"
+                        results.append(f"{status} {name} ({ip})")
                 
                 # Show results
                 msg = "🌐 Internet Connection Test\n\n"
                 msg += "\n".join(results)
                 
                 # Check if at least one succeeded
-                if any("✅" in r for r in results):
+                if any_ok:
                     msg += "\n\n✅ Internet is connected!"
                 else:
                     msg += "\n\n❌ No internet connection detected"
@@ -150,7 +911,7 @@ class NetworkToolsScreen(Screen):
                 logger.error(f"Internet check error: {e}")
                 self["status"].setText("Error checking internet")
         
-        threading.Thread(target=check_thread, daemon=True).start()
+        _submit(check_thread)
     
     def show_help(self):
         """Show help"""
@@ -170,25 +931,26 @@ class NetworkToolsScreen(Screen):
         self.session.open(MessageBox, text, MessageBox.TYPE_INFO, timeout=3)
 
 
+_NETWORK_SCANNER_SKIN = f"""
+        <screen name="NetworkScannerScreen" position="0,0" size="{_W},{_H}" backgroundColor="#1a1a1a" flags="wfNoBorder">
+            <eLabel position="0,0" size="{_W},80" backgroundColor="#3a1a5a" />
+            <eLabel text="Hosts that responded to &quot;ping&quot;" position="20,10" size="{_W-40},60" font="Regular;32" halign="center" valign="center" transparent="1" foregroundColor="#ffffff" />
+            
+            <widget name="results" position="100,120" size="{_W-200},{_H-250}" scrollbarMode="showOnDemand" backgroundColor="#2a2a2a" foregroundColor="#ffffff" selectionBackground="#1976d2" />
+            
+            <eLabel position="0,{_H-120}" size="{_W},120" backgroundColor="#1a1a1a" />
+            <widget name="status" position="20,{_H-110}" size="{_W-40},50" font="Regular;22" halign="center" valign="center" transparent="1" foregroundColor="#00ff00" />
+            <widget name="help" position="20,{_H-55}" size="{_W-40},40" font="Regular;18" halign="center" valign="center" transparent="1" foregroundColor="#aaaaaa" />
+        </screen>"""
+
+
 class NetworkScannerScreen(Screen):
     """Network Scanner - Ping sweep across IP range"""
     
     def __init__(self, session):
         Screen.__init__(self, session)
         
-        w, h = getDesktop(0).size().width(), getDesktop(0).size().height()
-        
-        self.skin = f"""
-        <screen name="NetworkScannerScreen" position="0,0" size="{w},{h}" backgroundColor="#1a1a1a" flags="wfNoBorder">
-            <eLabel position="0,0" size="{w},80" backgroundColor="#3a1a5a" />
-            <eLabel text="Hosts that responded to &quot;ping&quot;" position="20,10" size="{w-40},60" font="Regular;32" halign="center" valign="center" transparent="1" foregroundColor="#ffffff" />
-            
-            <widget name="results" position="100,120" size="{w-200},{h-250}" scrollbarMode="showOnDemand" backgroundColor="#2a2a2a" foregroundColor="#ffffff" selectionBackground="#1976d2" />
-            
-            <eLabel position="0,{h-120}" size="{w},120" backgroundColor="#1a1a1a" />
-            <widget name="status" position="20,{h-110}" size="{w-40},50" font="Regular;22" halign="center" valign="center" transparent="1" foregroundColor="#00ff00" />
-            <widget name="help" position="20,{h-55}" size="{w-40},40" font="Regular;18" halign="center" valign="center" transparent="1" foregroundColor="#aaaaaa" />
-        </screen>"""
+        self.skin = _NETWORK_SCANNER_SKIN
         
         self["results"] = MenuList([])
         self["status"] = Label("⏳ Scanning network...")
@@ -202,8 +964,19 @@ class NetworkScannerScreen(Screen):
         
         self.scan_results = []
         self.scanning = False
+        self._arp_cache = {}
+        self._gw_ip = None
+        self._own_ip = None
+        
+        # Worker results are handed over under the lock and applied by _flush_ui
+        self._lock = threading.Lock()
+        self._pending_hosts = []
+        self._scan_done = None
+        self._ui_timer = eTimer()
+        self._ui_timer.callback.append(self._flush_ui)
         
         self.onLayoutFinish.append(self.start_scan)
+        self.onClose.append(self._ui_timer.stop)
     
     def start_scan(self):
         """Start network scan"""
@@ -211,85 +984,91 @@ class NetworkScannerScreen(Screen):
             return
         
         self.scanning = True
-        self["status"].setText("⏳ Scanning network 192.168.100.1-254...")
+        self.scan_results = []
+        base_ip = _detect_subnet()
+        self["status"].setText(f"⏳ Scanning network {base_ip}1-254...")
+        
+        # Resolve gateway and own address once, not per replying host
+        self._gw_ip = _default_route()[1]
+        self._own_ip = _local_ip()
         self["results"].setList([("⏳ Scanning...", None)])
+        self._ui_timer.start(250)
         
         def scan_thread():
             try:
                 active_hosts = []
-                base_ip = "192.168.100."
+                alive = []
                 
-                # Scan range
-                for i in range(1, 255):
-                    if not self.scanning:
-                        break
-                    
-                    ip = base_ip + str(i)
+                def on_found(ip):
+                    alive.append(ip)
+                    with self._lock:
+                        self._pending_hosts.append(ip)
+                
+                # One raw ICMP socket for the whole range; TCP probes without CAP_NET_RAW
+                ips = [base_ip + str(i) for i in range(1, 255)]
+                try:
+                    _icmp_sweep(ips, on_found)
+                except PermissionError:
+                    if hasattr(asyncio, 'run'):
+                        asyncio.run(_sweep(ips, on_found, lambda: self.scanning))
+                    else:
+                        _thread_sweep(ips, on_found, lambda: self.scanning)
+                alive.sort(key=lambda ip: int(ip.rsplit('.', 1)[1]))
+                
+                # The sweep has populated the kernel ARP table; read it once
+                self._arp_cache = _load_arp_table()
+                
+                for ip in alive:
+                    # Get MAC address
+                    mac = self.get_mac_address(ip)
                     
-                    # Quick ping
-                    result = subprocess.run(
-                        ["ping", "-c", "1", "-W", "1", ip],
-                        capture_output=True,
-                        timeout=2
-                    )
+                    # Check if gateway
+                    label = "Gateway" if ip == self._gw_ip else ("Own" if ip == self._own_ip else "")
                     
-                    if result.returncode == 0:
-                        # Get MAC address
-                        mac = self.get_mac_address(ip)
-                        
-                        # Check if gateway
-                        label = "Gateway" if i == 1 else ("Own" if i == 27 else "")
-                        
-                        active_hosts.append((
-                            f"{ip:<17} {label:<8} | {mac}",
-                            {"ip": ip, "mac": mac, "label": label}
-                        ))
-                        
-                        # Update display
-                        self["results"].setList(active_hosts)
-                        self["status"].setText(f"Found {len(active_hosts)} devices...")
+                    active_hosts.append((
+                        f"{ip:<17} {label:<8} | {mac}",
+                        {"ip": ip, "mac": mac, "label": label}
+                    ))
                 
-                # Scan complete
-                if active_hosts:
-                    self["status"].setText(f"✅ Scan complete: {len(active_hosts)} devices found")
-                else:
-                    self["status"].setText("❌ No devices found")
-                    self["results"].setList([("No devices found", None)])
-                
-                self.scan_results = active_hosts
-                self.scanning = False
+                with self._lock:
+                    self._scan_done = (active_hosts, None)
                 
             except Exception as e:
                 logger.error(f"Scan error: {e}")
-                self["status"].setText(f"❌ Scan failed: {e}")
-                self.scanning = False
+                with self._lock:
+                    self._scan_done = (None, e)
         
-        threading.Thread(target=scan_thread, daemon=True).start()
+        _submit(scan_thread)
+    
+    def _flush_ui(self):
+        """Apply scan progress to the widgets (main thread, every 250ms)"""
+        with self._lock:
+            pending, self._pending_hosts = self._pending_hosts, []
+            done, self._scan_done = self._scan_done, None
+        
+        if done:
+            self._ui_timer.stop()
+            self.scanning = False
+            active_hosts, error = done
+            if error is not None:
+                self["status"].setText(f"❌ Scan failed: {error}")
+            elif active_hosts:
+                self.scan_results = active_hosts
+                self["results"].setList(active_hosts)
+                self["status"].setText(f"✅ Scan complete: {len(active_hosts)} devices found")
+            else:
+                self["status"].setText("❌ No devices found")
+                self["results"].setList([("No devices found", None)])
+        elif pending:
+            # One list rebuild per tick, not one per replying host
+            self.scan_results.extend((ip, {"ip": ip, "mac": "Unknown", "label": ""}) for ip in pending)
+            self.scan_results.sort(key=lambda item: int(item[0].rsplit('.', 1)[1]))
+            self["results"].setList(self.scan_results)
+            self["status"].setText(f"Found {len(self.scan_results)} devices...")
     
     def get_mac_address(self, ip):
         """Get MAC address for IP"""
-        try:
-            # Try ARP
-            result = subprocess.run(
-                ["arp", "-n", ip],
-                capture_output=True,
-                text=True,
-                timeout=2
-            )
-            
-            if result.returncode == 0:
-                # Parse ARP output
-                for line in result.stdout.split('\n'):
-                    if ip in line:
-                        parts = line.split()
-                        for part in parts:
-                            if ':' in part and len(part) == 17:
-                                return part.upper()
-            
-            return "Unknown"
-            
-        except:
-            return "Unknown"
+        return self._arp_cache.get(ip, "Unknown")
     
     def show_details(self):
         """Show device details"""
@@ -311,25 +1090,26 @@ class NetworkScannerScreen(Screen):
         self.session.open(MessageBox, msg, MessageBox.TYPE_INFO)
 
 
+_PORT_SCANNER_SKIN = f"""
+        <screen name="PortScannerScreen" position="0,0" size="{_W},{_H}" backgroundColor="#1a1a1a" flags="wfNoBorder">
+            <eLabel position="0,0" size="{_W},80" backgroundColor="#3a1a5a" />
+            <eLabel text="🔍 Select host to scan" position="20,10" size="{_W-40},60" font="Regular;32" halign="center" valign="center" transparent="1" foregroundColor="#ffffff" />
+            
+            <widget name="hostlist" position="100,120" size="{_W-200},{_H-250}" scrollbarMode="showOnDemand" backgroundColor="#2a2a2a" foregroundColor="#ffffff" selectionBackground="#1976d2" />
+            
+            <eLabel position="0,{_H-120}" size="{_W},120" backgroundColor="#1a1a1a" />
+            <widget name="status" position="20,{_H-110}" size="{_W-40},50" font="Regular;22" halign="center" valign="center" transparent="1" foregroundColor="#00ff00" />
+            <widget name="help" position="20,{_H-55}" size="{_W-40},40" font="Regular;18" halign="center" valign="center" transparent="1" foregroundColor="#aaaaaa" />
+        </screen>"""
+
+
 class PortScannerScreen(Screen):
     """Port Scanner - Scan for open ports on selected device"""
     
     def __init__(self, session):
         Screen.__init__(self, session)
         
-        w, h = getDesktop(0).size().width(), getDesktop(0).size().height()
-        
-        self.skin = f"""
-        <screen name="PortScannerScreen" position="0,0" size="{w},{h}" backgroundColor="#1a1a1a" flags="wfNoBorder">
-            <eLabel position="0,0" size="{w},80" backgroundColor="#3a1a5a" />
-            <eLabel text="🔍 Select host to scan" position="20,10" size="{w-40},60" font="Regular;32" halign="center" valign="center" transparent="1" foregroundColor="#ffffff" />
-            
-            <widget name="hostlist" position="100,120" size="{w-200},{h-250}" scrollbarMode="showOnDemand" backgroundColor="#2a2a2a" foregroundColor="#ffffff" selectionBackground="#1976d2" />
-            
-            <eLabel position="0,{h-120}" size="{w},120" backgroundColor="#1a1a1a" />
-            <widget name="status" position="20,{h-110}" size="{w-40},50" font="Regular;22" halign="center" valign="center" transparent="1" foregroundColor="#00ff00" />
-            <widget name="help" position="20,{h-55}" size="{w-40},40" font="Regular;18" halign="center" valign="center" transparent="1" foregroundColor="#aaaaaa" />
-        </screen>"""
+        self.skin = _PORT_SCANNER_SKIN
         
         self["hostlist"] = MenuList([])
         self["status"] = Label("Select a host to scan for open ports")
@@ -345,7 +1125,7 @@ class PortScannerScreen(Screen):
     def generate_host_list(self):
         """Generate list of IPs to scan"""
         hosts = []
-        base_ip = "192.168.100."
+        base_ip = _detect_subnet()
         
         for i in range(1, 20):
             ip = base_ip + str(i)
@@ -379,19 +1159,9 @@ class PortScannerScreen(Screen):
                     8080: "HTTP-Proxy"
                 }
                 
-                open_ports = []
-                
-                for port, service in common_ports.items():
-                    try:
-                        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-                        sock.settimeout(1)
-                        result = sock.connect_ex((ip, port))
-                        sock.close()
-                        
-                        if result == 0:
-                            open_ports.append(f"{port} ({service})")
-                    except:
-                        pass
+                # All ports in parallel: worst case is one timeout, not eleven
+                open_ports = [f"{port} ({common_ports[port]})"
+                              for port in _scan_ports(ip, list(common_ports))]
                 
                 # Show results
                 if open_ports:
@@ -409,7 +1179,20 @@ class PortScannerScreen(Screen):
                 logger.error(f"Port scan error: {e}")
                 self["status"].setText("Scan failed")
         
-        threading.Thread(target=scan_thread, daemon=True).start()
+        _submit(scan_thread)
+
+
+_DEVICE_DETECTION_SKIN = f"""
+        <screen name="DeviceDetectionScreen" position="0,0" size="{_W},{_H}" backgroundColor="#1a1a1a" flags="wfNoBorder">
+            <eLabel position="0,0" size="{_W},80" backgroundColor="#3a1a5a" />
+            <eLabel text="📱 Network Devices" position="20,10" size="{_W-40},60" font="Regular;32" halign="center" valign="center" transparent="1" foregroundColor="#ffffff" />
+            
+            <widget name="message" position="200,{_H//2-100}" size="{_W-400},200" font="Regular;28" halign="center" valign="center" backgroundColor="#2a2a2a" foregroundColor="#ffffff" />
+            
+            <eLabel position="0,{_H-120}" size="{_W},120" backgroundColor="#1a1a1a" />
+            <widget name="status" position="20,{_H-110}" size="{_W-40},50" font="Regular;22" halign="center" valign="center" transparent="1" foregroundColor="#00ff00" />
+            <widget name="help" position="20,{_H-55}" size="{_W-40},40" font="Regular;18" halign="center" valign="center" transparent="1" foregroundColor="#aaaaaa" />
+        </screen>"""
 
 
 class DeviceDetectionScreen(Screen):
@@ -418,19 +1201,7 @@ class DeviceDetectionScreen(Screen):
     def __init__(self, session):
         Screen.__init__(self, session)
         
-        w, h = getDesktop(0).size().width(), getDesktop(0).size().height()
-        
-        self.skin = f"""
-        <screen name="DeviceDetectionScreen" position="0,0" size="{w},{h}" backgroundColor="#1a1a1a" flags="wfNoBorder">
-            <eLabel position="0,0" size="{w},80" backgroundColor="#3a1a5a" />
-            <eLabel text="📱 Network Devices" position="20,10" size="{w-40},60" font="Regular;32" halign="center" valign="center" transparent="1" foregroundColor="#ffffff" />
-            
-            <widget name="message" position="200,{h//2-100}" size="{w-400},200" font="Regular;28" halign="center" valign="center" backgroundColor="#2a2a2a" foregroundColor="#ffffff" />
-            
-            <eLabel position="0,{h-120}" size="{w},120" backgroundColor="#1a1a1a" />
-            <widget name="status" position="20,{h-110}" size="{w-40},50" font="Regular;22" halign="center" valign="center" transparent="1" foregroundColor="#00ff00" />
-            <widget name="help" position="20,{h-55}" size="{w-40},40" font="Regular;18" halign="center" valign="center" transparent="1" foregroundColor="#aaaaaa" />
-        </screen>"""
+        self.skin = _DEVICE_DETECTION_SKIN
         
         self["message"] = Label("No devices found !\n\nScan network ?")
         self["status"] = Label("Press GREEN to scan")
@@ -449,23 +1220,7 @@ class DeviceDetectionScreen(Screen):
         def scan_thread():
             try:
                 # Get ARP table
-                result = subprocess.run(
-                    ["arp", "-a"],
-                    capture_output=True,
-                    text=True,
-                    timeout=5
-                )
-                
-                devices = []
-                if result.returncode == 0:
-                    for line in result.stdout.split('\n'):
-                        if "at" in line.lower():
-                            # Parse ARP entry
-                            parts = line.split()
-                            if len(parts) >= 4:
-                                ip = parts[1].strip('()')
-                                mac = parts[3]
-                                devices.append(f"{ip} ({mac})")
+                devices = [f"{ip} ({mac})" for ip, mac in _load_arp_table().items()]
                 
                 # Show results
                 if devices:
@@ -485,7 +1240,20 @@ class DeviceDetectionScreen(Screen):
                 self["message"].setText(f"Detection failed:\n{e}")
                 self["status"].setText("Error")
         
-        threading.Thread(target=scan_thread, daemon=True).start()
+        _submit(scan_thread)
+
+
+_NETWORK_MAP_SKIN = f"""
+        <screen name="NetworkMapScreen" position="0,0" size="{_W},{_H}" backgroundColor="#1a1a1a" flags="wfNoBorder">
+            <eLabel position="0,0" size="{_W},80" backgroundColor="#3a1a5a" />
+            <eLabel text="🗺️ Network Map" position="20,10" size="{_W-40},60" font="Regular;32" halign="center" valign="center" transparent="1" foregroundColor="#ffffff" />
+            
+            <widget name="map" position="100,120" size="{_W-200},{_H-250}" font="Regular;20" halign="left" valign="top" transparent="1" foregroundColor="#ffffff" />
+            
+            <eLabel position="0,{_H-120}" size="{_W},120" backgroundColor="#1a1a1a" />
+            <widget name="status" position="20,{_H-110}" size="{_W-40},50" font="Regular;22" halign="center" valign="center" transparent="1" foregroundColor="#00ff00" />
+            <widget name="help" position="20,{_H-55}" size="{_W-40},40" font="Regular;18" halign="center" valign="center" transparent="1" foregroundColor="#aaaaaa" />
+        </screen>"""
 
 
 class NetworkMapScreen(Screen):
@@ -494,19 +1262,7 @@ class NetworkMapScreen(Screen):
     def __init__(self, session):
         Screen.__init__(self, session)
         
-        w, h = getDesktop(0).size().width(), getDesktop(0).size().height()
-        
-        self.skin = f"""
-        <screen name="NetworkMapScreen" position="0,0" size="{w},{h}" backgroundColor="#1a1a1a" flags="wfNoBorder">
-            <eLabel position="0,0" size="{w},80" backgroundColor="#3a1a5a" />
-            <eLabel text="🗺️ Network Map" position="20,10" size="{w-40},60" font="Regular;32" halign="center" valign="center" transparent="1" foregroundColor="#ffffff" />
-            
-            <widget name="map" position="100,120" size="{w-200},{h-250}" font="Regular;20" halign="left" valign="top" transparent="1" foregroundColor="#ffffff" />
-            
-            <eLabel position="0,{h-120}" size="{w},120" backgroundColor="#1a1a1a" />
-            <widget name="status" position="20,{h-110}" size="{w-40},50" font="Regular;22" halign="center" valign="center" transparent="1" foregroundColor="#00ff00" />
-            <widget name="help" position="20,{h-55}" size="{w-40},40" font="Regular;18" halign="center" valign="center" transparent="1" foregroundColor="#aaaaaa" />
-        </screen>"""
+        self.skin = _NETWORK_MAP_SKIN
         
         self["map"] = Label("")
         self["status"] = Label("Building network map...")
@@ -543,7 +1299,20 @@ class NetworkMapScreen(Screen):
                 logger.error(f"Map error: {e}")
                 self["status"].setText("Map generation failed")
         
-        threading.Thread(target=map_thread, daemon=True).start()
+        _submit(map_thread)
+
+
+_SMB_SHARE_SCANNER_SKIN = f"""
+        <screen name="SMBShareScannerScreen" position="0,0" size="{_W},{_H}" backgroundColor="#1a1a1a" flags="wfNoBorder">
+            <eLabel position="0,0" size="{_W},80" backgroundColor="#3a1a5a" />
+            <eLabel text="🗄️ CIFS/SMB Share Scanner" position="20,10" size="{_W-40},60" font="Regular;32" halign="center" valign="center" transparent="1" foregroundColor="#ffffff" />
+            
+            <widget name="host_list" position="100,120" size="{_W-200},{_H-250}" scrollbarMode="showOnDemand" backgroundColor="#2a2a2a" foregroundColor="#ffffff" selectionBackground="#1976d2" />
+            
+            <eLabel position="0,{_H-120}" size="{_W},120" backgroundColor="#1a1a1a" />
+            <widget name="status" position="20,{_H-110}" size="{_W-40},50" font="Regular;22" halign="center" valign="center" transparent="1" foregroundColor="#00ff00" />
+            <widget name="help" position="20,{_H-55}" size="{_W-40},40" font="Regular;18" halign="center" valign="center" transparent="1" foregroundColor="#aaaaaa" />
+        </screen>"""
 
 
 class SMBShareScannerScreen(Screen):
@@ -552,63 +1321,24 @@ class SMBShareScannerScreen(Screen):
     def __init__(self, session):
         Screen.__init__(self, session)
         
-        w, h = getDesktop(0).size().width(), getDesktop(0).size().height()
-        
-        self.skin = f"""
-        <screen name="SMBShareScannerScreen" position="0,0" size="{w},{h}" backgroundColor="#1a1a1a" flags="wfNoBorder">
-            <eLabel position="0,0" size="{w},80" backgroundColor="#3a1a5a" />
-            <eLabel text="🗄️ CIFS/SMB Share Scanner" position="20,10" size="{w-40},60" font="Regular;32" halign="center" valign="center" transparent="1" foregroundColor="#ffffff" />
-            
-            <widget name="host_list" position="100,120" size="{w-200},{h-250}" scrollbarMode="showOnDemand" backgroundColor="#2a2a2a" foregroundColor="#ffffff" selectionBackground="#1976d2" />
-            
-            <eLabel position="0,{h-120}" size="{w},120" backgroundColor="#1a1a1a" />
-            <widget name="status" position="20,{h-110}" size="{w-40},50" font="Regular;22" halign="center" valign="center" transparent="1" foregroundColor="#00ff00" />
-            <widget name="help" position="20,{h-55}" size="{w-40},40" font="Regular;18" halign="center" valign="center" transparent="1" foregroundColor="#aaaaaa" />
-        </screen>"""
+        self.skin = _SMB_SHARE_SCANNER_SKIN
         
         self["host_list"] = MenuList([])
         self["status"] = Label("⏳ Scanning for SMB/CIFS hosts...")
-        self["help"] = Label("OK:Scan Shares  GREEN:Auto-scan  RED:Manual  EXIT:Back")
+        self["help"] = Label("OK:Scan Shares  GREEN:Auto-scan  YELLOW:Rescan  RED:Manual  EXIT:Back")
         
         self["actions"] = ActionMap(["OkCancelActions", "ColorActions"], {
             "ok": self.scan_selected_host,
             "cancel": self.close,
             "green": self.auto_scan,
+            "yellow": self.rescan_selected_host,
             "red": self.manual_entry,
         }, -1)
         
         self.discovered_hosts = []
         self.scanning = False
         
-        self.onLayoutFinish.append(self.check_dependencies)
-    
-    def check_dependencies(self):
-        """Check if smbclient is available"""
-        try:
-            result = subprocess.run(
-                ["which", "smbclient"],
-                capture_output=True,
-                timeout=2
-            )
-            
-            if result.returncode == 0:
-                # smbclient is available, start auto scan
-                self.auto_scan()
-            else:
-                # smbclient not found
-                self["status"].setText("⚠️ smbclient not installed!")
-                self["host_list"].setList([
-                    ("❌ smbclient not found", None),
-                    ("", None),
-                    ("Install with:", None),
-                    ("opkg install samba-client", None),
-                    ("", None),
-                    ("or try manual IP entry (RED button)", None)
-                ])
-                self["help"].setText("RED:Manual Entry  EXIT:Back")
-        except Exception as e:
-            logger.error(f"Dependency check error: {e}")
-            self["status"].setText("Error checking dependencies")
+        self.onLayoutFinish.append(self.auto_scan)
     
     def auto_scan(self):
         """Automatically scan network for SMB hosts"""
@@ -623,49 +1353,34 @@ class SMBShareScannerScreen(Screen):
             try:
                 smb_hosts = []
                 
-                # Method 1: Try nmblookup (NetBIOS name resolution)
+                # Method 1: NetBIOS node status query (UDP/137), no samba tools needed
                 try:
-                    result = subprocess.run(
-                        ["nmblookup", "-A", "192.168.100.255"],
-                        capture_output=True,
-                        text=True,
-                        timeout=10
-                    )
-                    
-                    if result.returncode == 0:
-                        # Parse nmblookup output
-                        current_ip = None
-                        for line in result.stdout.split('\n'):
-                            if "Looking up status" in line:
-                                # Extract IP
-                                parts = line.split()
-                                for part in parts:
-                                    if '192.168.' in part:
-                                        current_ip = part
-                            elif current_ip and '<20>' in line:
-                                # File server service
-                                name = line.split()[0].strip()
-                                if name not in [h[1]['name'] for h in smb_hosts if h[1]]:
-                                    smb_hosts.append((
-                                        f"🗄️ {name:<15} ({current_ip})",
-                                        {'ip': current_ip, 'name': name, 'method': 'nmblookup'}
-                                    ))
+                    base_ip = _detect_subnet()
+                    ips = [base_ip + str(i) for i in range(1, 255)]
+                    seen_names = set()
+                    for ip, name in _netbios_scan(ips, base_ip + "255"):
+                        if name not in seen_names:
+                            seen_names.add(name)
+                            _NB_CACHE[name] = (ip, time.monotonic())
+                            smb_hosts.append((
+                                f"🗄️ {name:<15} ({ip})",
+                                {'ip': ip, 'name': name, 'method': 'netbios'}
+                            ))
                 except Exception as e:
-                    logger.debug(f"nmblookup failed: {e}")
+                    logger.debug(f"NetBIOS scan failed: {e}")
                 
-                # Method 2: Scan common SMB IPs (445/139)
+                # Method 2: Scan the subnet for open SMB ports (445/139)
                 if len(smb_hosts) == 0:
                     self["status"].setText("⏳ Scanning IP range for SMB ports...")
                     
-                    base_ip = "192.168.100."
-                    for i in [1, 2, 9, 10, 15, 18, 27, 50, 100, 200]:  # Common IPs
+                    base_ip = _detect_subnet()
+                    smb_ports = self.check_smb_ports([base_ip + str(i) for i in range(1, 255)])
+                    for i in range(1, 255):
                         ip = base_ip + str(i)
-                        
-                        # Check if SMB port is open
-                        if self.check_smb_port(ip):
+                        if ip in smb_ports:
                             smb_hosts.append((
                                 f"🗄️ SMB Host at {ip}",
-                                {'ip': ip, 'name': f"host-{i}", 'method': 'port_scan'}
+                                {'ip': ip, 'name': f"host-{i}", 'method': 'port_scan', 'port': smb_ports[ip]}
                             ))
                 
                 # Update display
@@ -685,45 +1400,32 @@ class SMBShareScannerScreen(Screen):
                 self.discovered_hosts = smb_hosts
                 self.scanning = False
                 
+                # Most users open one of the first hosts: have their shares ready
+                for _, host in smb_hosts[:_PREFETCH_HOSTS]:
+                    _prefetch_shares(host['ip'], host.get('port'))
+                
             except Exception as e:
                 logger.error(f"Auto scan error: {e}")
                 self["status"].setText(f"Scan failed: {str(e)[:50]}")
                 self.scanning = False
         
-        threading.Thread(target=scan_thread, daemon=True).start()
+        _SMB_POOL.submit(scan_thread)
     
-    def check_smb_port(self, ip):
-        """Check if SMB port is open"""
-        try:
-            # Check port 445 (SMB)
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(0.5)
-            result = sock.connect_ex((ip, 445))
-            sock.close()
-            
-            if result == 0:
-                return True
-            
-            # Try port 139 (NetBIOS)
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(0.5)
-            result = sock.connect_ex((ip, 139))
-            sock.close()
-            
-            return result == 0
-            
-        except:
-            return False
+    def check_smb_ports(self, ips):
+        """Return {ip: open SMB port} for ips (445, else NetBIOS 139)"""
+        # Native SMB2/3 transport first across all hosts, with a tight timeout
+        found = {ip: 445 for ip, _ in connect_many([(ip, 445) for ip in ips], 0.3)}
+        rest = [ip for ip in ips if ip not in found]
+        found.update((ip, 139) for ip, _ in connect_many([(ip, 139) for ip in rest], 0.5))
+        return found
     
     def manual_entry(self):
         """Manually enter SMB server IP"""
-        from Screens.VirtualKeyBoard import VirtualKeyBoard
-        
         self.session.openWithCallback(
             self.manual_entry_callback,
             VirtualKeyBoard,
             title="Enter SMB server IP or hostname:",
-            text="192.168.100."
+            text=_detect_subnet()
         )
     
     def manual_entry_callback(self, server):
@@ -747,69 +1449,54 @@ class SMBShareScannerScreen(Screen):
             return
         
         host_info = current[1]
-        self.scan_shares(host_info['ip'])
+        self.scan_shares(host_info['ip'], host_info.get('port'))
+    
+    def rescan_selected_host(self):
+        """Drop cached shares of the selected host and scan it again"""
+        current = self["host_list"].getCurrent()
+        if not current or not current[1]:
+            return
+        
+        _SHARE_CACHE.pop(current[1]['ip'], None)
+        self.scan_shares(current[1]['ip'], current[1].get('port'))
     
-    def scan_shares(self, server):
-        """Scan for shares on server"""
+    def scan_shares(self, server, port=None):
+        """Scan for shares on server (port: SMB port found by discovery, if any)"""
+        cached = _cache_get(_SHARE_CACHE, server)
+        if cached is not None:
+            self.session.open(SMBShareDetailsScreen, server, cached)
+            return
+        
         self["status"].setText(f"⏳ Scanning shares on {server}...")
         
+        def on_progress(count):
+            self["status"].setText(f"⏳ {server}: {count} shares found...")
+        
         def scan_thread():
             try:
                 shares = []
                 
-                # Method 1: Try smbclient
+                # Native SMB session, then smbclient parsing shares as its output streams in
                 try:
-                    result = subprocess.run(
-                        ["smbclient", "-L", server, "-N", "-g"],
-                        capture_output=True,
-                        text=True,
-                        timeout=15
-                    )
-                    
-                    if result.returncode == 0:
-                        # Parse smbclient output
-                        for line in result.stdout.split('\n'):
-                            if '|Disk|' in line:
-                                parts = line.split('|')
-                                if len(parts) >= 2:
-                                    share_name = parts[1]
-                                    # FIXED: Proper condition without broken line
-                                    if share_name and not share_name.endswith('$'):
-                                        description = parts[2] if len(parts) > 2 else ''
-                                        shares.append({
-                                            'name': share_name,
-                                            'type': 'Disk',
-                                            'description': description,
-                                            'server': server
-                                        })
+                    future = _inflight.get(server)
+                    if future is not None:
+                        # Discovery already started listing this host
+                        shares = future.result(timeout=_PREFETCH_WAIT)
                     else:
-                        # Try with guest credentials
-                        result = subprocess.run(
-                            ["smbclient", "-L", server, "-U", "guest%", "-g"],
-                            capture_output=True,
-                            text=True,
-                            timeout=15
-                        )
-                        
-                        if result.returncode == 0:
-                            for line in result.stdout.split('\n'):
-                                if '|Disk|' in line:
-                                    parts = line.split('|')
-                                    if len(parts) >= 2:
-                                        share_name = parts[1]
-                                        # FIXED: Proper condition without broken line
-                                        if share_name and not share_name.endswith('$'):
-                                            shares.append({
-                                                'name': share_name,
-                                                'type': 'Disk',
-                                                'server': server
-                                            })
+                        shares = _list_shares(server, port, on_progress)
                 
+                except FileNotFoundError:
+                    self.session.open(MessageBox,
+                                    "⚠️ smbclient not installed!\n\nInstall with:\nopkg install samba-client",
+                                    MessageBox.TYPE_ERROR)
+                    self["status"].setText("⚠️ smbclient not installed!")
+                    return
                 except Exception as e:
                     logger.error(f"smbclient scan error: {e}")
                 
                 # Show results
                 if shares:
+                    _SHARE_CACHE[server] = (time.monotonic(), shares)
                     self.session.open(
                         SMBShareDetailsScreen,
                         server,
@@ -835,7 +1522,20 @@ class SMBShareScannerScreen(Screen):
                 logger.error(f"Share scan error: {e}")
                 self["status"].setText(f"Scan failed: {str(e)[:50]}")
         
-        threading.Thread(target=scan_thread, daemon=True).start()
+        _SMB_POOL.submit(scan_thread)
+
+
+_SMB_SHARE_DETAILS_SKIN = f"""
+        <screen name="SMBShareDetailsScreen" position="0,0" size="{_W},{_H}" backgroundColor="#1a1a1a" flags="wfNoBorder">
+            <eLabel position="0,0" size="{_W},80" backgroundColor="#3a1a5a" />
+            <eLabel text="📁 Available Shares" position="20,10" size="{_W-40},60" font="Regular;32" halign="center" valign="center" transparent="1" foregroundColor="#ffffff" />
+            
+            <widget name="share_list" position="100,120" size="{_W-200},{_H-250}" scrollbarMode="showOnDemand" backgroundColor="#2a2a2a" foregroundColor="#ffffff" selectionBackground="#1976d2" />
+            
+            <eLabel position="0,{_H-120}" size="{_W},120" backgroundColor="#1a1a1a" />
+            <widget name="status" position="20,{_H-110}" size="{_W-40},50" font="Regular;22" halign="center" valign="center" transparent="1" foregroundColor="#00ff00" />
+            <widget name="help" position="20,{_H-55}" size="{_W-40},40" font="Regular;18" halign="center" valign="center" transparent="1" foregroundColor="#aaaaaa" />
+        </screen>"""
 
 
 class SMBShareDetailsScreen(Screen):
@@ -847,19 +1547,7 @@ class SMBShareDetailsScreen(Screen):
         self.server = server
         self.shares = shares
         
-        w, h = getDesktop(0).size().width(), getDesktop(0).size().height()
-        
-        self.skin = f"""
-        <screen name="SMBShareDetailsScreen" position="0,0" size="{w},{h}" backgroundColor="#1a1a1a" flags="wfNoBorder">
-            <eLabel position="0,0" size="{w},80" backgroundColor="#3a1a5a" />
-            <eLabel text="📁 Available Shares" position="20,10" size="{w-40},60" font="Regular;32" halign="center" valign="center" transparent="1" foregroundColor="#ffffff" />
-            
-            <widget name="share_list" position="100,120" size="{w-200},{h-250}" scrollbarMode="showOnDemand" backgroundColor="#2a2a2a" foregroundColor="#ffffff" selectionBackground="#1976d2" />
-            
-            <eLabel position="0,{h-120}" size="{w},120" backgroundColor="#1a1a1a" />
-            <widget name="status" position="20,{h-110}" size="{w-40},50" font="Regular;22" halign="center" valign="center" transparent="1" foregroundColor="#00ff00" />
-            <widget name="help" position="20,{h-55}" size="{w-40},40" font="Regular;18" halign="center" valign="center" transparent="1" foregroundColor="#aaaaaa" />
-        </screen>"""
+        self.skin = _SMB_SHARE_DETAILS_SKIN
         
         self["share_list"] = MenuList([])
         self["status"] = Label(f"Server: {server} - {len(shares)} shares found")
@@ -877,17 +1565,7 @@ class SMBShareDetailsScreen(Screen):
     
     def populate_shares(self):
         """Populate share list"""
-        share_items = []
-        
-        for share in self.shares:
-            desc = share.get('description', '')
-            display = f"📁 {share['name']:<20}"
-            if desc:
-                display += f" - {desc[:30]}"
-            
-            share_items.append((display, share))
-        
-        self["share_list"].setList(share_items)
+        self["share_list"].setList([_share_row(share) for share in self.shares])
     
     def browse_share(self):
         """Browse share contents"""
@@ -906,37 +1584,22 @@ class SMBShareDetailsScreen(Screen):
         
         share = current[1]
         
-        import json
-        
         try:
-            favorites_file = "/tmp/wgfilemanager_smb_favorites.json"
-            favorites = []
-            
-            # Load existing favorites
-            if os.path.exists(favorites_file):
-                with open(favorites_file, 'r') as f:
-                    favorites = json.load(f)
-            
             # Check if already in favorites
-            for fav in favorites:
-                if fav['server'] == self.server and fav['share'] == share['name']:
-                    self.session.open(MessageBox,
-                                    "Already in favorites!",
-                                    MessageBox.TYPE_INFO, timeout=2)
-                    return
+            if _is_favorite(self.server, share['name']):
+                self.session.open(MessageBox,
+                                "Already in favorites!",
+                                MessageBox.TYPE_INFO, timeout=2)
+                return
             
             # Add to favorites
-            favorites.append({
+            _add_favorite({
                 'server': self.server,
                 'share': share['name'],
                 'description': share.get('description', ''),
                 'type': share.get('type', 'Disk')
             })
             
-            # Save
-            with open(favorites_file, 'w') as f:
-                json.dump(favorites, f, indent=2)
-            
             self.session.open(MessageBox,
                             f"⭐ Added to favorites!\n\n{self.server}/{share['name']}",
                             MessageBox.TYPE_INFO, timeout=2)
@@ -1003,60 +1666,87 @@ class SMBShareDetailsScreen(Screen):
         def mount_thread():
             try:
                 mount_point = f"/media/net/{share['name']}"
+                if _is_mounted(mount_point):
+                    self.session.open(MessageBox,
+                                    f"✅ Share already mounted!\n\nLocation: {mount_point}",
+                                    MessageBox.TYPE_INFO, timeout=5)
+                    self["status"].setText("✅ Already mounted")
+                    return
+                
+                unc = f"//{_resolve_host(self.server)}/{share['name']}"
                 
                 # Create mount point
                 os.makedirs(mount_point, exist_ok=True)
                 
-                # Mount command
-                mount_cmd = [
-                    "mount", "-t", "cifs",
-                    f"//{self.server}/{share['name']}",
-                    mount_point,
-                    "-o", "guest,vers=3.0,iocharset=utf8"
-                ]
+                # Scratch mount points live in a hidden temp directory, not
+                # next to the real mount point
+                scratch = tempfile.mkdtemp(prefix=".wgfm-smb-")
                 
-                result = subprocess.run(
-                    mount_cmd,
-                    capture_output=True,
-                    text=True,
-                    timeout=15
-                )
+                def try_mount(version):
+                    # Each SMB version mounts on its own scratch point
+                    target = os.path.join(scratch, f"v{version}")
+                    os.mkdir(target)
+                    result = subprocess.run(
+                        ["mount", "-t", "cifs", unc, target,
+                         "-o", f"guest,vers={version},iocharset=utf8"],
+                        stdout=subprocess.DEVNULL,
+                        stderr=subprocess.PIPE,
+                        text=True,
+                        timeout=15
+                    )
+                    return version, target, result
                 
-                if result.returncode == 0:
-                    msg = f"✅ Share Mounted!\n\n"
-                    msg += f"Location: {mount_point}\n\n"
-                    msg += "You can now access the share in WGFileManager"
-                    
-                    self.session.open(MessageBox, msg, MessageBox.TYPE_INFO, timeout=5)
-                    self["status"].setText("✅ Mount successful")
-                else:
-                    # Try other SMB versions
-                    for version in ["2.0", "1.0"]:
-                        mount_cmd = [
-                            "mount", "-t", "cifs",
-                            f"//{self.server}/{share['name']}",
-                            mount_point,
-                            "-o", f"guest,vers={version},iocharset=utf8"
-                        ]
-                        
-                        result = subprocess.run(
-                            mount_cmd,
-                            capture_output=True,
-                            timeout=15
-                        )
+                # Try all SMB versions at once but take results in order of
+                # preference: a lower version only wins once every higher one
+                # has failed. The winner is moved onto the real mount point and
+                # any other success is unmounted.
+                # A private executor avoids waiting on our own _SMB_POOL slots.
+                winner = None
+                error = "Unknown error"
+                executor = ThreadPoolExecutor(max_workers=3)
+                try:
+                    futures = [executor.submit(try_mount, v) for v in ("3.0", "2.0", "1.0")]
+                    for future in futures:
+                        try:
+                            version, target, result = future.result()
+                        except Exception as e:
+                            error = str(e)
+                            continue
                         
                         if result.returncode == 0:
-                            msg = f"✅ Share Mounted (SMB {version})!\n\n"
-                            msg += f"Location: {mount_point}"
-                            
-                            self.session.open(MessageBox, msg, MessageBox.TYPE_INFO, timeout=5)
-                            self["status"].setText("✅ Mount successful")
-                            return
-                    
+                            if winner is None and subprocess.run(
+                                    ["mount", "--move", target, mount_point],
+                                    stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                                    timeout=15).returncode == 0:
+                                winner = version
+                                msg = f"✅ Share Mounted (SMB {version})!\n\n"
+                                msg += f"Location: {mount_point}\n\n"
+                                msg += "You can now access the share in WGFileManager"
+                                
+                                self.session.open(MessageBox, msg, MessageBox.TYPE_INFO, timeout=5)
+                                self["status"].setText("✅ Mount successful")
+                            else:
+                                subprocess.run(["umount", target], stdout=subprocess.DEVNULL,
+                                               stderr=subprocess.DEVNULL, timeout=15)
+                        elif result.stderr:
+                            error = result.stderr
+                        
+                        try:
+                            os.rmdir(target)
+                        except OSError:
+                            pass
+                finally:
+                    executor.shutdown(wait=False)
+                    try:
+                        os.rmdir(scratch)
+                    except OSError:
+                        pass
+                    _forget_mounts()
+                
+                if winner is None:
                     # All mount attempts failed
-                    error = result.stderr[:200] if result.stderr else "Unknown error"
                     msg = f"❌ Mount Failed\n\n"
-                    msg += f"Error: {error}\n\n"
+                    msg += f"Error: {error[:200]}\n\n"
                     msg += "Try:\n"
                     msg += "• Check network connectivity\n"
                     msg += "• Verify share permissions\n"
@@ -1069,7 +1759,20 @@ class SMBShareDetailsScreen(Screen):
                 logger.error(f"Mount error: {e}")
                 self["status"].setText(f"Mount error: {str(e)[:50]}")
         
-        threading.Thread(target=mount_thread, daemon=True).start()
+        _SMB_POOL.submit(mount_thread)
+
+
+_FAVORITE_SHARES_SKIN = f"""
+        <screen name="FavoriteSharesScreen" position="0,0" size="{_W},{_H}" backgroundColor="#1a1a1a" flags="wfNoBorder">
+            <eLabel position="0,0" size="{_W},80" backgroundColor="#3a1a5a" />
+            <eLabel text="⭐ Favorite Shares" position="20,10" size="{_W-40},60" font="Regular;32" halign="center" valign="center" transparent="1" foregroundColor="#ffffff" />
+            
+            <widget name="favorites_list" position="100,120" size="{_W-200},{_H-250}" scrollbarMode="showOnDemand" backgroundColor="#2a2a2a" foregroundColor="#ffffff" selectionBackground="#1976d2" />
+            
+            <eLabel position="0,{_H-120}" size="{_W},120" backgroundColor="#1a1a1a" />
+            <widget name="status" position="20,{_H-110}" size="{_W-40},50" font="Regular;22" halign="center" valign="center" transparent="1" foregroundColor="#00ff00" />
+            <widget name="help" position="20,{_H-55}" size="{_W-40},40" font="Regular;18" halign="center" valign="center" transparent="1" foregroundColor="#aaaaaa" />
+        </screen>"""
 
 
 class FavoriteSharesScreen(Screen):
@@ -1078,19 +1781,7 @@ class FavoriteSharesScreen(Screen):
     def __init__(self, session):
         Screen.__init__(self, session)
         
-        w, h = getDesktop(0).size().width(), getDesktop(0).size().height()
-        
-        self.skin = f"""
-        <screen name="FavoriteSharesScreen" position="0,0" size="{w},{h}" backgroundColor="#1a1a1a" flags="wfNoBorder">
-            <eLabel position="0,0" size="{w},80" backgroundColor="#3a1a5a" />
-            <eLabel text="⭐ Favorite Shares" position="20,10" size="{w-40},60" font="Regular;32" halign="center" valign="center" transparent="1" foregroundColor="#ffffff" />
-            
-            <widget name="favorites_list" position="100,120" size="{w-200},{h-250}" scrollbarMode="showOnDemand" backgroundColor="#2a2a2a" foregroundColor="#ffffff" selectionBackground="#1976d2" />
-            
-            <eLabel position="0,{h-120}" size="{w},120" backgroundColor="#1a1a1a" />
-            <widget name="status" position="20,{h-110}" size="{w-40},50" font="Regular;22" halign="center" valign="center" transparent="1" foregroundColor="#00ff00" />
-            <widget name="help" position="20,{h-55}" size="{w-40},40" font="Regular;18" halign="center" valign="center" transparent="1" foregroundColor="#aaaaaa" />
-        </screen>"""
+        self.skin = _FAVORITE_SHARES_SKIN
         
         self["favorites_list"] = MenuList([])
         self["status"] = Label("")
@@ -1103,29 +1794,22 @@ class FavoriteSharesScreen(Screen):
             "red": self.delete_favorite,
         }, -1)
         
-        self.favorites_file = "/tmp/wgfilemanager_smb_favorites.json"
+        self.favorites_file = FAVORITES_FILE
         self.favorites = []
         
         self.onLayoutFinish.append(self.load_favorites)
     
     def load_favorites(self):
         """Load saved favorites"""
-        import json
-        
         try:
-            if os.path.exists(self.favorites_file):
-                with open(self.favorites_file, 'r') as f:
-                    self.favorites = json.load(f)
+            self.favorites = _get_favorites()
             
             if self.favorites:
-                items = []
-                for fav in self.favorites:
-                    display = f"⭐ {fav['server']}/{fav['share']}"
-                    if fav.get('description'):
-                        display += f" - {fav['description'][:20]}"
-                    items.append((display, fav))
-                
-                self["favorites_list"].setList(items)
+                self["favorites_list"].setList([
+                    (f"⭐ {fav['server']}/{fav['share']}"
+                     + (f" - {fav['description'][:20]}" if fav.get('description') else ""), fav)
+                    for fav in self.favorites
+                ])
                 self["status"].setText(f"{len(self.favorites)} favorite shares")
             else:
                 self["favorites_list"].setList([
@@ -1142,11 +1826,8 @@ class FavoriteSharesScreen(Screen):
     
     def save_favorites(self):
         """Save favorites to file"""
-        import json
-        
         try:
-            with open(self.favorites_file, 'w') as f:
-                json.dump(self.favorites, f, indent=2)
+            _save_favorites(self.favorites)
             return True
         except Exception as e:
             logger.error(f"Save favorites error: {e}")
@@ -1183,16 +1864,25 @@ class FavoriteSharesScreen(Screen):
         def mount_thread():
             try:
                 mount_point = f"/media/net/{fav['share']}"
+                if _is_mounted(mount_point):
+                    self.session.open(MessageBox,
+                                    f"✅ Already mounted!\n\n{mount_point}",
+                                    MessageBox.TYPE_INFO, timeout=3)
+                    self["status"].setText("✅ Already mounted")
+                    return
+                
                 os.makedirs(mount_point, exist_ok=True)
                 
                 result = subprocess.run(
                     ["mount", "-t", "cifs",
-                     f"//{fav['server']}/{fav['share']}",
+                     f"//{_resolve_host(fav['server'])}/{fav['share']}",
                      mount_point,
                      "-o", "guest,vers=3.0,iocharset=utf8"],
-                    capture_output=True,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
                     timeout=15
                 )
+                _forget_mounts()
                 
                 if result.returncode == 0:
                     self.session.open(MessageBox, 
@@ -1205,7 +1895,7 @@ class FavoriteSharesScreen(Screen):
                 logger.error(f"Mount error: {e}")
                 self["status"].setText("Mount error")
         
-        threading.Thread(target=mount_thread, daemon=True).start()
+        _SMB_POOL.submit(mount_thread)
     
     def browse_favorite(self):
         """Browse favorite share"""
@@ -1240,12 +1930,8 @@ class FavoriteSharesScreen(Screen):
             return
         
         try:
-            # Remove from list
-            self.favorites = [f for f in self.favorites 
-                            if not (f['server'] == fav['server'] and f['share'] == fav['share'])]
-            
-            # Save and reload
-            self.save_favorites()
+            # Remove, save and reload
+            _remove_favorite(fav['server'], fav['share'])
             self.load_favorites()
             
             self["status"].setText("Removed from favorites")
@@ -1254,6 +1940,19 @@ class FavoriteSharesScreen(Screen):
             self["status"].setText("Delete failed")
 
 
+_SMB_SHARE_BROWSER_SKIN = f"""
+        <screen name="SMBShareBrowserScreen" position="0,0" size="{_W},{_H}" backgroundColor="#1a1a1a" flags="wfNoBorder">
+            <eLabel position="0,0" size="{_W},80" backgroundColor="#3a1a5a" />
+            <widget name="title" position="20,10" size="{_W-40},60" font="Regular;28" halign="center" valign="center" transparent="1" foregroundColor="#ffffff" />
+            
+            <widget name="file_list" position="100,120" size="{_W-200},{_H-250}" scrollbarMode="showOnDemand" backgroundColor="#2a2a2a" foregroundColor="#ffffff" selectionBackground="#1976d2" />
+            
+            <eLabel position="0,{_H-120}" size="{_W},120" backgroundColor="#1a1a1a" />
+            <widget name="status" position="20,{_H-110}" size="{_W-40},50" font="Regular;22" halign="center" valign="center" transparent="1" foregroundColor="#00ff00" />
+            <widget name="help" position="20,{_H-55}" size="{_W-40},40" font="Regular;18" halign="center" valign="center" transparent="1" foregroundColor="#aaaaaa" />
+        </screen>"""
+
+
 class SMBShareBrowserScreen(Screen):
     """Browse SMB share contents before mounting"""
     
@@ -1264,29 +1963,18 @@ class SMBShareBrowserScreen(Screen):
         self.share = share
         self.current_path = ""
         
-        w, h = getDesktop(0).size().width(), getDesktop(0).size().height()
-        
-        self.skin = f"""
-        <screen name="SMBShareBrowserScreen" position="0,0" size="{w},{h}" backgroundColor="#1a1a1a" flags="wfNoBorder">
-            <eLabel position="0,0" size="{w},80" backgroundColor="#3a1a5a" />
-            <widget name="title" position="20,10" size="{w-40},60" font="Regular;28" halign="center" valign="center" transparent="1" foregroundColor="#ffffff" />
-            
-            <widget name="file_list" position="100,120" size="{w-200},{h-250}" scrollbarMode="showOnDemand" backgroundColor="#2a2a2a" foregroundColor="#ffffff" selectionBackground="#1976d2" />
-            
-            <eLabel position="0,{h-120}" size="{w},120" backgroundColor="#1a1a1a" />
-            <widget name="status" position="20,{h-110}" size="{w-40},50" font="Regular;22" halign="center" valign="center" transparent="1" foregroundColor="#00ff00" />
-            <widget name="help" position="20,{h-55}" size="{w-40},40" font="Regular;18" halign="center" valign="center" transparent="1" foregroundColor="#aaaaaa" />
-        </screen>"""
+        self.skin = _SMB_SHARE_BROWSER_SKIN
         
         self["title"] = Label(f"📁 Browsing: //{server}/{share}")
         self["file_list"] = MenuList([])
         self["status"] = Label("⏳ Loading...")
-        self["help"] = Label("OK:Enter  BACK:Parent  GREEN:Mount  EXIT:Close")
+        self["help"] = Label("OK:Enter  BACK:Parent  GREEN:Mount  YELLOW:Reload  EXIT:Close")
         
         self["actions"] = ActionMap(["OkCancelActions", "ColorActions"], {
             "ok": self.enter_directory,
             "cancel": self.go_back,
             "green": self.mount_share,
+            "yellow": self.reload_directory,
             "back": self.parent_directory,
         }, -1)
         
@@ -1295,51 +1983,35 @@ class SMBShareBrowserScreen(Screen):
     def browse_directory(self, path=""):
         """Browse directory in share"""
         self.current_path = path
+        cached = _cache_get(_DIR_CACHE, (self.server, self.share, path))
+        if cached is not None:
+            self._show_listing(path, cached)
+            return
+        
         self["status"].setText(f"⏳ Loading {path if path else 'root'}...")
         
         def browse_thread():
             try:
-                # Use smbclient to list directory
-                smb_path = f"//{self.server}/{self.share}/{path}"
+                # Native SMB session when pysmb is installed, else smbclient
+                host = _resolve_host(self.server)
+                entries = _native_list_path(host, self.share, path)
+                if entries is None and _ls_safe(path):
+                    entries = _smbclient_ls(host, self.share, [path]).get(path)
+                elif entries is None:
+                    entries = _smbclient_ls_path(host, self.share, path)
                 
-                result = subprocess.run(
-                    ["smbclient", smb_path, "-N", "-c", "ls"],
-                    capture_output=True,
-                    text=True,
-                    timeout=15
-                )
-                
-                items = []
-                
-                if result.returncode == 0:
-                    # Parse directory listing
-                    for line in result.stdout.split('\n'):
-                        line = line.strip()
-                        if not line or line.startswith('.'):
-                            continue
-                        
-                        # Parse smbclient ls output
-                        parts = line.split()
-                        if len(parts) >= 3:
-                            name = parts[0]
-                            attrs = parts[1] if len(parts) > 1 else ""
-                            size = parts[2] if len(parts) > 2 else "0"
-                            
-                            is_dir = 'D' in attrs
-                            icon = "📁" if is_dir else "📄"
-                            
-                            items.append((
-                                f"{icon} {name}",
-                                {'name': name, 'is_dir': is_dir, 'size': size}
-                            ))
+                if entries is not None:
+                    items = _dir_rows(path, entries)
+                    _DIR_CACHE[(self.server, self.share, path)] = (time.monotonic(), items)
+                    self._show_listing(path, items)
                     
-                    # Add parent directory option if not in root
+                    # Have the parent and first subdirectories ready for the next step,
+                    # listed together in one smbclient session
+                    nearby = [f"{path}/{entry['name']}" if path else entry['name']
+                              for entry in entries if entry['is_dir']][:_BROWSE_PREFETCH]
                     if path:
-                        items.insert(0, ("📂 [..]  (Parent Directory)", {'name': '..', 'is_dir': True}))
-                    
-                    self["file_list"].setList(items if items else [("(Empty directory)", None)])
-                    self["status"].setText(f"📁 {len(items)} items")
-                    self["title"].setText(f"📁 //{self.server}/{self.share}/{path}")
+                        nearby.insert(0, path.rpartition('/')[0])
+                    _prefetch_dirs(self.server, self.share, nearby)
                 else:
                     self["file_list"].setList([
                         ("❌ Cannot browse share", None),
@@ -1347,12 +2019,23 @@ class SMBShareBrowserScreen(Screen):
                         ("Access may require authentication", None),
                     ])
                     self["status"].setText("Browse failed")
-                
+            
             except Exception as e:
                 logger.error(f"Browse error: {e}")
                 self["status"].setText(f"Error: {str(e)[:50]}")
         
-        threading.Thread(target=browse_thread, daemon=True).start()
+        _SMB_POOL.submit(browse_thread)
+    
+    def _show_listing(self, path, items):
+        """Display a directory listing"""
+        self["file_list"].setList(items if items else [("(Empty directory)", None)])
+        self["status"].setText(f"📁 {len(items)} items")
+        self["title"].setText(f"📁 //{self.server}/{self.share}/{path}")
+    
+    def reload_directory(self):
+        """Drop the cached listing of the current directory and list it again"""
+        _DIR_CACHE.pop((self.server, self.share, self.current_path), None)
+        self.browse_directory(self.current_path)
     
     def enter_directory(self):
         """Enter selected directory"""
@@ -1424,16 +2107,25 @@ class SMBShareBrowserScreen(Screen):
         def mount_thread():
             try:
                 mount_point = f"/media/net/{self.share}"
+                if _is_mounted(mount_point):
+                    self.session.open(MessageBox,
+                                    f"✅ Already mounted!\n\n{mount_point}",
+                                    MessageBox.TYPE_INFO, timeout=3)
+                    self["status"].setText("✅ Already mounted")
+                    return
+                
                 os.makedirs(mount_point, exist_ok=True)
                 
                 result = subprocess.run(
                     ["mount", "-t", "cifs",
-                     f"//{self.server}/{self.share}",
+                     f"//{_resolve_host(self.server)}/{self.share}",
                      mount_point,
                      "-o", "guest,vers=3.0,iocharset=utf8"],
-                    capture_output=True,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
                     timeout=15
                 )
+                _forget_mounts()
                 
                 if result.returncode == 0:
                     self.session.open(MessageBox,
@@ -1446,4 +2138,4 @@ class SMBShareBrowserScreen(Screen):
                 logger.error(f"Mount error: {e}")
                 self["status"].setText("Mount error")
         
-        threading.Thread(target=mount_thread, daemon=True).start()
\ No newline at end of file
+        _SMB_POOL.submit(mount_thread)
\ No newline at end of file
@@ -1,37 +1,82 @@
 import json
 import os
+from collections import defaultdict
 from datetime import datetime
 from ..constants import REMOTE_CONNECTIONS_FILE
 from ..exceptions import RemoteConnectionError
 
+# orjson (C extension) when installed; both paths work on UTF-8 bytes
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+def _dumps(obj):
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+    return json.dumps(obj, indent=2, ensure_ascii=False).encode('utf-8')
+
+def _loads(data):
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+# last_used refreshes from test_connection are written at most this often;
+# newer timestamps stay in memory until the next save or flush()
+LAST_USED_SAVE_INTERVAL = 3600
+
+ALLOWED_TYPES = frozenset(('ftp', 'sftp', 'webdav', 'cifs'))
+REQUIRED_FIELDS = ('type', 'host', 'port', 'username')
+
+_MISSING = object()
+
 class RemoteConnectionManager:
     def __init__(self, config):
         self.config = config
         self.connections_file = REMOTE_CONNECTIONS_FILE
+        self._dirty = False
+        # Required field values -> validation result
+        self._valid_cache = {}
         self.connections = self.load_connections()
+        # name -> last_used as it was in the file at the last load/save
+        self._saved_last_used = self._last_used_snapshot()
+        # type -> {name: connection}, kept in step with self.connections
+        self._by_type = defaultdict(dict)
+        for name, conn in self.connections.items():
+            self._by_type[conn['type']][name] = conn
         self.active_connections = {}
     
     def load_connections(self):
         """Load saved remote connections"""
         try:
             if os.path.exists(self.connections_file):
-                with open(self.connections_file, 'r') as f:
-                    connections = json.load(f)
-                    # Validate connections structure
-                    valid_connections = {}
-                    for name, conn in connections.items():
-                        if self._validate_connection(conn):
-                            valid_connections[name] = conn
-                    return valid_connections
+                # One read() of the whole (small) file, decoded from the raw bytes
+                with open(self.connections_file, 'rb') as f:
+                    connections = _loads(f.read())
+                # Validate connections structure
+                valid_connections = {}
+                for name, conn in connections.items():
+                    if self._validate_connection(conn):
+                        valid_connections[name] = conn
+                return valid_connections
         except Exception:
             pass
         return {}
     
     def save_connections(self):
-        """Save remote connections"""
+        """Save remote connections if they changed since the last save"""
+        if not self._dirty:
+            return True
         try:
-            with open(self.connections_file, 'w') as f:
-                json.dump(self.connections, f, indent=2)
+            # Encode up front: one write() instead of json.dump's per-token writes,
+            # and a failed encode leaves the old file untouched
+            payload = _dumps(self.connections)
+            tmp_file = self.connections_file + '.tmp'
+            with open(tmp_file, 'wb') as f:
+                f.write(payload)
+            os.replace(tmp_file, self.connections_file)
+            self._dirty = False
+            self._saved_last_used = self._last_used_snapshot()
             return True
         except Exception as e:
             raise RemoteConnectionError(f"Failed to save connections: {e}")
@@ -54,7 +99,10 @@ class RemoteConnectionManager:
             if not self._validate_connection(connection):
                 raise RemoteConnectionError("Invalid connection parameters")
             
+            self._unindex(name)
             self.connections[name] = connection
+            self._by_type[connection_type][name] = connection
+            self._dirty = True
             self.save_connections()
             return True
             
@@ -64,17 +112,22 @@ class RemoteConnectionManager:
     def update_connection(self, name, **kwargs):
         """Update existing connection"""
         try:
-            if name not in self.connections:
+            connection = self.connections.get(name)
+            if connection is None:
                 raise RemoteConnectionError(f"Connection not found: {name}")
             
-            connection = self.connections[name]
+            old_type = connection['type']
             connection.update(kwargs)
             connection['last_used'] = datetime.now().isoformat()
             
             if not self._validate_connection(connection):
                 raise RemoteConnectionError("Invalid connection parameters after update")
             
+            if connection['type'] != old_type:
+                self._by_type[old_type].pop(name, None)
+                self._by_type[connection['type']][name] = connection
             self.connections[name] = connection
+            self._dirty = True
             self.save_connections()
             return True
             
@@ -84,11 +137,13 @@ class RemoteConnectionManager:
     def remove_connection(self, name):
         """Remove a remote connection"""
         try:
-            if name in self.connections:
-                del self.connections[name]
-                self.save_connections()
-                return True
-            return False
+            removed = self.connections.pop(name, _MISSING)
+            if removed is _MISSING:
+                return False
+            self._by_type[removed['type']].pop(name, None)
+            self._dirty = True
+            self.save_connections()
+            return True
         except Exception as e:
             raise RemoteConnectionError(f"Failed to remove connection: {e}")
     
@@ -99,7 +154,8 @@ class RemoteConnectionManager:
     def list_connections(self, connection_type=None):
         """List all connections, optionally filtered by type"""
         if connection_type:
-            return {k: v for k, v in self.connections.items() if v.get('type') == connection_type}
+            bucket = self._by_type.get(connection_type)
+            return bucket.copy() if bucket else {}
         return self.connections.copy()
     
     def test_connection(self, name):
@@ -136,23 +192,66 @@ class RemoteConnectionManager:
             
             if success:
                 # Update last used time
-                self.update_connection(name)
+                self._touch(name)
             
             return success, message
             
         except Exception as e:
             raise RemoteConnectionError(f"Test connection failed: {e}")
     
+    def _unindex(self, name):
+        """Drop name from the type index"""
+        conn = self.connections.get(name)
+        if conn is not None:
+            self._by_type[conn['type']].pop(name, None)
+    
+    def _last_used_snapshot(self):
+        return {name: conn.get('last_used') for name, conn in self.connections.items()}
+    
+    def _touch(self, name):
+        """Refresh last_used, writing it only when the saved value is stale"""
+        connection = self.connections[name]
+        now = datetime.now()
+        try:
+            saved = datetime.fromisoformat(self._saved_last_used[name])
+            stale = (now - saved).total_seconds() >= LAST_USED_SAVE_INTERVAL
+        except (KeyError, TypeError, ValueError):
+            stale = True
+        
+        connection['last_used'] = now.isoformat()
+        self._dirty = True
+        if stale:
+            self.save_connections()
+    
+    def flush(self):
+        """Write any pending changes (e.g. in-memory last_used updates)"""
+        try:
+            return self.save_connections()
+        except RemoteConnectionError:
+            return False
+    
     def _validate_connection(self, connection):
         """Validate connection parameters"""
-        required_fields = ['type', 'host', 'port', 'username']
-        
-        for field in required_fields:
+        # The result depends only on the required fields, so it can be reused
+        key = tuple(connection.get(field, _MISSING) for field in REQUIRED_FIELDS)
+        try:
+            return self._valid_cache[key]
+        except KeyError:
+            valid = self._check_connection(connection)
+            self._valid_cache[key] = valid
+            return valid
+        except TypeError:
+            # Unhashable field values cannot be cached
+            return self._check_connection(connection)
+    
+    def _check_connection(self, connection):
+        """Check connection parameters"""
+        for field in REQUIRED_FIELDS:
             if field not in connection:
                 return False
         
         # Validate type
-        if connection['type'] not in ['ftp', 'sftp', 'webdav', 'cifs']:
+        if connection['type'] not in ALLOWED_TYPES:
             return False
         
         # Validate host
@@ -173,6 +272,8 @@ class RemoteConnectionManager:
         """Clear all connections"""
         try:
             self.connections = {}
+            self._by_type.clear()
+            self._dirty = True
             self.save_connections()
             return True
         except Exception as e:
@@ -1,41 +1,255 @@
 import subprocess
 import os
+import shutil
+import posixpath
+import re
+import stat
+import tempfile
+import threading
+from functools import lru_cache
+from concurrent.futures import ThreadPoolExecutor
 from ..constants import DEFAULT_SFTP_PORT, DEFAULT_TIMEOUT
 from ..exceptions import RemoteConnectionError, NetworkError
 from ..utils.validators import validate_hostname, validate_port, sanitize_string
+from ..utils.listing_cache import ListingCache
 import shlex
 
+# paramiko keeps one authenticated SSH transport per server in-process;
+# without it every operation forks sshpass + ssh/scp
+try:
+    import paramiko
+except ImportError:
+    paramiko = None
+
+# One `ls -la` entry: perms, links, owner, group, size (or "major, minor"
+# for devices), three date fields, then the name (which may contain spaces)
+_LS_RE = re.compile(
+    r'^(?P<perms>[-bcdlps][-rwxsStT]{9}\S*)\s+\S+\s+\S+\s+\S+\s+'
+    r'(?P<size>\d+|\d+,\s*\d+)\s+\S+\s+\S+\s+\S+\s(?P<name>.+)$',
+    re.M
+)
+
+# OpenSSH connection sharing: a detached master connection per host is
+# started once and later calls reuse it for CONTROL_PERSIST seconds,
+# skipping the TCP handshake, key exchange and authentication
+CONTROL_PATH = "/tmp/wgfm-ssh-%r@%h:%p"
+CONTROL_PERSIST = 60
+
+# Fixed argv prefixes, built once; calls append port, target and command.
+# sshpass -e reads the password from the SSHPASS env var
+_SSH_OPTS = (
+    "-o", "BatchMode=yes",
+    "-o", "ConnectTimeout=5",
+    "-o", "StrictHostKeyChecking=no",
+)
+# Starts the master in the background (-f -N) with nothing to print, so it
+# never holds a caller's pipe open
+_SSH_MASTER_CMD = (
+    "sshpass", "-e", "ssh", *_SSH_OPTS,
+    "-o", "ControlMaster=yes",
+    "-o", f"ControlPersist={CONTROL_PERSIST}",
+    "-o", f"ControlPath={CONTROL_PATH}",
+    "-o", "LogLevel=QUIET",
+    "-f", "-N",
+)
+# Reuse a running master but never start one from a captured call: with
+# ControlMaster=auto the forked master inherits capture_output's stderr
+# and run() blocks until it exits
+_MUX_OPTS = (
+    "-o", "ControlMaster=no",
+    "-o", f"ControlPath={CONTROL_PATH}",
+)
+# The connection test never reuses a master, so it really authenticates
+_SSH_TEST_CMD = ("sshpass", "-e", "ssh", *_SSH_OPTS, "-o", "PasswordAuthentication=yes")
+_SSH_CMD = ("sshpass", "-e", "ssh", *_SSH_OPTS)
+_SCP_CMD = ("sshpass", "-e", "scp", "-o", "StrictHostKeyChecking=no")
+# -b implies BatchMode=yes; the earlier BatchMode=no wins so sshpass can answer
+_SFTP_BATCH_CMD = ("sshpass", "-e", "sftp", "-o", "BatchMode=no", "-o", "StrictHostKeyChecking=no")
+
+LISTING_CACHE_SIZE = 64
+LISTING_CACHE_TTL = 30  # seconds
+
+@lru_cache(maxsize=None)
+def _is_openssh():
+    """Whether ssh is OpenSSH; dropbear's dbclient lacks the Control* options"""
+    try:
+        result = subprocess.run(
+            ["ssh", "-V"], capture_output=True, text=True, timeout=5
+        )
+    except (OSError, subprocess.SubprocessError):
+        return False
+    # ssh -V reports on stderr
+    return "OpenSSH" in result.stderr or "OpenSSH" in result.stdout
+
 class SFTPClient:
     def __init__(self, config):
         self.config = config
         self.timeout = DEFAULT_TIMEOUT
+        # Resolved once; looked up again only while still missing
+        self._sshpass = shutil.which("sshpass")
+        # Environment snapshot for sshpass; only SSHPASS varies per call
+        self._base_env = dict(os.environ)
+        self._last_env = (None, None)
+        # Local directories already created (or found) by downloads
+        self._mkdir_cache = set()
+        # (host, port, username, path) -> (timestamp, entries)
+        self._dir_cache = ListingCache(LISTING_CACHE_SIZE, LISTING_CACHE_TTL, copy_entry=dict)
+        # (host, port, username) -> (SSHClient, SFTPClient, lock) when paramiko is installed
+        self._sessions = {}
+        self._session_lock = threading.Lock()
+        # (host, port, username) -> lock held while connecting to that server
+        self._connect_locks = {}
+    
+    def _env(self, password):
+        """Return the subprocess environment carrying SSHPASS"""
+        last_password, env = self._last_env
+        if env is None or last_password != password:
+            env = dict(self._base_env, SSHPASS=password)
+            self._last_env = (password, env)
+        return env
+    
+    def _mux_opts(self, host, port, username, env):
+        """Return options reusing host's master connection, starting it if needed; () without one"""
+        if not _is_openssh():
+            return ()
+        socket_path = (CONTROL_PATH.replace("%r", username)
+                       .replace("%h", host).replace("%p", str(port)))
+        if not os.path.exists(socket_path):
+            try:
+                subprocess.run(
+                    [*_SSH_MASTER_CMD, "-p", str(port), f"{username}@{host}"],
+                    stdin=subprocess.DEVNULL,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
+                    env=env,
+                    timeout=15
+                )
+            except (OSError, subprocess.SubprocessError):
+                return ()
+            if not os.path.exists(socket_path):
+                return ()
+        return _MUX_OPTS
+    
+    def _connect(self, host, port, username, password):
+        """Open an authenticated paramiko SSHClient"""
+        client = paramiko.SSHClient()
+        # Same trust model as StrictHostKeyChecking=no on the ssh paths
+        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        client.connect(host, port=int(port), username=username, password=password,
+                       timeout=5, banner_timeout=10, auth_timeout=10)
+        return client
+    
+    def _session(self, host, port, username, password):
+        """Return a pooled (SSHClient, SFTPClient, lock), or None without paramiko.
+        
+        A session whose transport has dropped is replaced on the next call.
+        Connecting holds only that server's lock, so a slow host does not
+        block sessions to other hosts.
+        """
+        if paramiko is None:
+            return None
+        if not validate_hostname(host):
+            raise RemoteConnectionError(f"Invalid host: {host}")
+        if not validate_port(port):
+            raise RemoteConnectionError(f"Invalid port: {port}")
+        
+        key = (host, str(port), username)
+        with self._session_lock:
+            session = self._sessions.get(key)
+            if session is not None and self._session_alive(session):
+                return session
+            connect_lock = self._connect_locks.setdefault(key, threading.Lock())
+        
+        with connect_lock:
+            # Another thread may have connected while we waited
+            with self._session_lock:
+                session = self._sessions.get(key)
+            if session is not None:
+                if self._session_alive(session):
+                    return session
+                session[0].close()
+            
+            client = self._connect(host, port, username, password)
+            try:
+                session = (client, client.open_sftp(), threading.Lock())
+            except Exception:
+                client.close()
+                raise
+            with self._session_lock:
+                self._sessions[key] = session
+            return session
+    
+    @staticmethod
+    def _session_alive(session):
+        transport = session[0].get_transport()
+        return transport is not None and transport.is_active()
+    
+    def _attr_entry(self, attr, prefix, sftp):
+        """Build an entry dict from a paramiko SFTPAttributes"""
+        mode = attr.st_mode or 0
+        is_link = stat.S_ISLNK(mode)
+        target = None
+        if is_link:
+            try:
+                target = sftp.readlink(prefix + attr.filename)
+            except IOError:
+                pass
+        
+        return {
+            'name': attr.filename,
+            'path': prefix + attr.filename,
+            'is_dir': stat.S_ISDIR(mode),
+            'is_link': is_link,
+            'target': target,
+            'size': attr.st_size or 0,
+            'permissions': stat.filemode(mode),
+            'full_line': str(attr)
+        }
+    
+    def _ensure_local_dir(self, local_path):
+        """Create the parent directory of local_path once per client"""
+        local_dir = os.path.dirname(local_path)
+        if local_dir and local_dir not in self._mkdir_cache:
+            os.makedirs(local_dir, exist_ok=True)
+            self._mkdir_cache.add(local_dir)
+    
+    def _cache_key(self, host, port, username, path):
+        return (host, str(port), username, path.rstrip('/') or '/')
+    
+    def invalidate(self, host, port, username, path):
+        """Drop cached listings for a remote path and its parent (call after writes)"""
+        key = self._cache_key(host, port, username, path)
+        parent = key[:3] + (posixpath.dirname(key[3]) or '/',)
+        self._dir_cache.discard(key, parent)
     
     def test_connection(self, host, port=DEFAULT_SFTP_PORT, username="root", password=""):
-        """Test SSH/SFTP connection using sshpass"""
+        """Test SSH/SFTP connection using paramiko or sshpass"""
         try:
             validate_hostname(host)
             validate_port(port)
             
+            if paramiko is not None:
+                # Fresh connection, so the credentials are really checked
+                try:
+                    self._connect(host, port, username, password).close()
+                    return True, "SSH/SFTP connection successful"
+                except paramiko.AuthenticationException:
+                    return False, "SSH error: authentication failed"
+                except (paramiko.SSHException, OSError) as e:
+                    return False, f"SSH error: {str(e)[:100]}"
+            
             # Check if sshpass is available
-            sshpass_check = subprocess.run(
-                ["which", "sshpass"],
-                capture_output=True,
-                timeout=5
-            )
-            if sshpass_check.returncode != 0:
+            if self._sshpass is None:
+                self._sshpass = shutil.which("sshpass")
+            if self._sshpass is None:
                 return False, "sshpass not installed. Install with: opkg install sshpass"
             
             # SECURITY FIX: Use environment variable instead of command line
-            env = os.environ.copy()
-            env['SSHPASS'] = password
+            env = self._env(password)
             
             # Test connection with ssh
             test_cmd = [
-                "sshpass", "-e",  # Read password from SSHPASS env var
-                "ssh", "-o", "BatchMode=yes",
-                "-o", "ConnectTimeout=5",
-                "-o", "StrictHostKeyChecking=no",
-                "-o", "PasswordAuthentication=yes",
+                *_SSH_TEST_CMD,
                 "-p", str(port),
                 f"{username}@{host}",
                 "echo test"
@@ -66,18 +280,22 @@ class SFTPClient:
             validate_hostname(host)
             validate_port(port)
             
+            session = self._session(host, port, username, password)
+            if session is not None:
+                _, stdout, stderr = session[0].exec_command(command, timeout=15)
+                out = stdout.read().decode('utf-8', 'replace')
+                err = stderr.read().decode('utf-8', 'replace')
+                return stdout.channel.recv_exit_status() == 0, out, err
+            
             # SECURITY FIX: Properly escape command
             safe_command = shlex.quote(command)
             
             # Use environment variable for password
-            env = os.environ.copy()
-            env['SSHPASS'] = password
+            env = self._env(password)
             
             sshpass_cmd = [
-                "sshpass", "-e",
-                "ssh", "-o", "BatchMode=yes",
-                "-o", "ConnectTimeout=5",
-                "-o", "StrictHostKeyChecking=no",
+                *_SSH_CMD,
+                *self._mux_opts(host, port, username, env),
                 "-p", str(port),
                 f"{username}@{host}",
                 safe_command
@@ -98,9 +316,46 @@ class SFTPClient:
         except Exception as e:
             return False, "", str(e)
     
+    def _ls_entry(self, match, prefix):
+        """Build an entry dict from an _LS_RE match; prefix is the directory with a trailing '/'"""
+        permissions, size, name = match.group('perms', 'size', 'name')
+        
+        # Handle symlink
+        target = None
+        if permissions.startswith('l'):
+            name, _, target = name.partition(' -> ')
+            target = target or None
+        
+        return {
+            'name': name,
+            'path': prefix + name,
+            'is_dir': permissions.startswith('d'),
+            'is_link': permissions.startswith('l'),
+            'target': target,
+            # Device nodes show "major, minor" instead of a size
+            'size': int(size) if size.isdigit() else 0,
+            'permissions': permissions,
+            'full_line': match.group(0)
+        }
+    
     def list_directory(self, host, port, username, password, path="/"):
         """List directory contents via SFTP/SSH"""
         try:
+            key = self._cache_key(host, port, username, path)
+            cached = self._dir_cache.get(key)
+            if cached is not None:
+                return True, cached
+            
+            prefix = path.rstrip('/') + '/'
+            session = self._session(host, port, username, password)
+            if session is not None:
+                # Attributes come back from the server; no ls output to parse
+                _, sftp, lock = session
+                with lock:
+                    entries = [self._attr_entry(attr, prefix, sftp) for attr in sftp.listdir_attr(path)]
+                self._dir_cache.set(key, entries)
+                return True, entries
+            
             # SECURITY FIX: Properly quote path
             safe_path = shlex.quote(path)
             
@@ -111,55 +366,67 @@ class SFTPClient:
             if not success:
                 return False, f"Failed to list directory: {stderr}"
             
-            # Parse ls output
-            lines = stdout.strip().split('\n')
-            entries = []
-            
-            for line in lines[1:]:  # Skip total line
-                if not line.strip():
-                    continue
-                
-                parts = line.split()
-                if len(parts) >= 8:
-                    permissions = parts[0]
-                    size = parts[4]
-                    month = parts[5]
-                    day = parts[6]
-                    time_or_year = parts[7]
-                    name = ' '.join(parts[8:])
-                    
-                    # Handle symlink
-                    if "->" in name:
-                        name, target = name.split("->")
-                        name = name.strip()
-                        target = target.strip()
-                    else:
-                        target = None
-                    
-                    is_dir = permissions.startswith('d')
-                    is_link = permissions.startswith('l')
-                    
-                    try:
-                        size_int = int(size)
-                    except ValueError:
-                        size_int = 0
-                    
-                    entries.append({
-                        'name': name,
-                        'path': os.path.join(path, name) if path != '/' else '/' + name,
-                        'is_dir': is_dir,
-                        'is_link': is_link,
-                        'target': target,
-                        'size': size_int,
-                        'permissions': permissions,
-                        'full_line': line
-                    })
+            # Parse ls output in one pass; the "total" line never matches
+            entries = [self._ls_entry(match, prefix) for match in _LS_RE.finditer(stdout)]
+            self._dir_cache.set(key, entries)
             
             return True, entries
             
         except Exception as e:
             return False, f"List directory failed: {e}"
     
+    def iter_directory(self, host, port, username, password, path="/", timeout=15):
+        """Yield directory entries as `ls -la` output arrives over SSH"""
+        validate_hostname(host)
+        validate_port(port)
+        
+        session = self._session(host, port, username, password)
+        if session is not None:
+            _, sftp, lock = session
+            prefix = path.rstrip('/') + '/'
+            with lock:
+                entries = [self._attr_entry(attr, prefix, sftp) for attr in sftp.listdir_iter(path)]
+            yield from entries
+            return
+        
+        env = self._env(password)
+        
+        sshpass_cmd = [
+            *_SSH_CMD,
+            *self._mux_opts(host, port, username, env),
+            "-p", str(port),
+            f"{username}@{host}",
+            # Remote shell parses this; only the path needs quoting
+            f"ls -la {shlex.quote(path)}"
+        ]
+        
+        proc = subprocess.Popen(
+            sshpass_cmd,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            env=env
+        )
+        timer = threading.Timer(timeout, proc.kill)
+        timer.daemon = True
+        timer.start()
+        prefix = path.rstrip('/') + '/'
+        try:
+            for line in proc.stdout:
+                match = _LS_RE.match(line.rstrip('\n'))
+                if match:
+                    yield self._ls_entry(match, prefix)
+            proc.wait()
+            if proc.returncode != 0:
+                raise RemoteConnectionError(f"Failed to list directory: {proc.stderr.read()[:200]}")
+        finally:
+            timer.cancel()
+            if proc.poll() is None:
+                proc.kill()
+                proc.wait()
+            proc.stdout.close()
+            proc.stderr.close()
+    
     def download_file(self, host, port, username, password, remote_path, local_path):
         """Download file via scp"""
         try:
@@ -171,18 +438,22 @@ class SFTPClient:
             safe_local = shlex.quote(local_path)
             
             # Create local directory if it doesn't exist
-            local_dir = os.path.dirname(local_path)
-            if local_dir and not os.path.exists(local_dir):
-                os.makedirs(local_dir, exist_ok=True)
+            self._ensure_local_dir(local_path)
+            
+            session = self._session(host, port, username, password)
+            if session is not None:
+                _, sftp, lock = session
+                with lock:
+                    sftp.get(remote_path, local_path)
+                return True, f"Downloaded: {remote_path}"
             
             # Use environment variable for password
-            env = os.environ.copy()
-            env['SSHPASS'] = password
+            env = self._env(password)
             
             # Download with scp
             scp_cmd = [
-                "sshpass", "-e",
-                "scp", "-o", "StrictHostKeyChecking=no",
+                *_SCP_CMD,
+                *self._mux_opts(host, port, username, env),
                 "-P", str(port),
                 f"{username}@{host}:{safe_remote}",
                 safe_local
@@ -219,14 +490,21 @@ class SFTPClient:
             if not os.path.exists(local_path):
                 return False, f"Local file not found: {local_path}"
             
+            session = self._session(host, port, username, password)
+            if session is not None:
+                _, sftp, lock = session
+                with lock:
+                    sftp.put(local_path, remote_path)
+                self.invalidate(host, port, username, remote_path)
+                return True, f"Uploaded: {remote_path}"
+            
             # Use environment variable for password
-            env = os.environ.copy()
-            env['SSHPASS'] = password
+            env = self._env(password)
             
             # Upload with scp
             scp_cmd = [
-                "sshpass", "-e",
-                "scp", "-o", "StrictHostKeyChecking=no",
+                *_SCP_CMD,
+                *self._mux_opts(host, port, username, env),
                 "-P", str(port),
                 safe_local,
                 f"{username}@{host}:{safe_remote}"
@@ -241,6 +519,7 @@ class SFTPClient:
             )
             
             if result.returncode == 0:
+                self.invalidate(host, port, username, remote_path)
                 return True, f"Uploaded: {remote_path}"
             else:
                 return False, f"Upload failed: {result.stderr[:100]}"
@@ -250,6 +529,109 @@ class SFTPClient:
         except Exception as e:
             return False, f"Upload error: {e}"
     
+    def transfer_many(self, host, port, username, password, pairs, direction="get"):
+        """Transfer many files over one sftp session.
+        
+        pairs holds (remote_path, local_path) tuples; direction is "get" or "put".
+        sftp stops at the first failed transfer.
+        """
+        batch_file = None
+        try:
+            validate_hostname(host)
+            validate_port(port)
+            
+            if direction not in ("get", "put"):
+                return False, f"Invalid transfer direction: {direction}"
+            if not pairs:
+                return True, "Nothing to transfer"
+            
+            session = self._session(host, port, username, password)
+            if session is not None:
+                _, sftp, lock = session
+                try:
+                    with lock:
+                        for remote_path, local_path in pairs:
+                            if direction == "get":
+                                self._ensure_local_dir(local_path)
+                                sftp.get(remote_path, local_path)
+                            else:
+                                sftp.put(local_path, remote_path)
+                finally:
+                    if direction == "put":
+                        for remote_path, _ in pairs:
+                            self.invalidate(host, port, username, remote_path)
+                return True, f"Transferred {len(pairs)} files"
+            
+            def quote(path):
+                return '"' + path.replace('\\', '\\\\').replace('"', '\\"') + '"'
+            
+            # Write the get/put commands to a batch file
+            batch_fd, batch_file = tempfile.mkstemp(prefix='wgfilemanager_', suffix='.sftp', dir='/tmp')
+            with os.fdopen(batch_fd, 'w') as f:
+                for remote_path, local_path in pairs:
+                    if direction == "get":
+                        self._ensure_local_dir(local_path)
+                        f.write(f"get {quote(remote_path)} {quote(local_path)}\n")
+                    else:
+                        f.write(f"put {quote(local_path)} {quote(remote_path)}\n")
+            
+            # Use environment variable for password
+            env = self._env(password)
+            
+            sftp_cmd = [
+                *_SFTP_BATCH_CMD,
+                *self._mux_opts(host, port, username, env),
+                "-P", str(port),
+                "-b", batch_file,
+                f"{username}@{host}"
+            ]
+            
+            result = subprocess.run(
+                sftp_cmd,
+                capture_output=True,
+                timeout=30 * len(pairs),
+                text=True,
+                env=env
+            )
+            
+            if direction == "put":
+                # Even a failed batch may have stored some of the files
+                for remote_path, _ in pairs:
+                    self.invalidate(host, port, username, remote_path)
+            
+            if result.returncode == 0:
+                return True, f"Transferred {len(pairs)} files"
+            else:
+                return False, f"Transfer failed: {result.stderr[:100]}"
+                
+        except subprocess.TimeoutExpired:
+            return False, "Transfer timed out"
+        except Exception as e:
+            return False, f"Transfer error: {e}"
+        finally:
+            if batch_file:
+                try:
+                    os.unlink(batch_file)
+                except OSError:
+                    pass
+    
+    def bulk_download(self, host, port, username, password, pairs, max_workers=4):
+        """Download (remote_path, local_path) pairs concurrently
+        
+        Returns {(remote_path, local_path): (success, message)}; repeated
+        pairs are downloaded once. The scp workers share the ControlMaster
+        connection; a pooled paramiko session serializes them.
+        """
+        def download_one(pair):
+            remote_path, local_path = pair
+            return self.download_file(host, port, username, password, remote_path, local_path)
+        
+        # Materialize once: iterators would be used up by map before zip
+        pairs = list(dict.fromkeys(pairs))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(download_one, pairs))
+        return dict(zip(pairs, results))
+    
     def create_directory(self, host, port, username, password, path):
         """Create directory on remote server"""
         try:
@@ -258,6 +640,7 @@ class SFTPClient:
             success, stdout, stderr = self.execute_command(host, port, username, password, command)
             
             if success:
+                self.invalidate(host, port, username, path)
                 return True, f"Created directory: {path}"
             else:
                 return False, f"Create directory failed: {stderr}"
@@ -273,6 +656,7 @@ class SFTPClient:
             success, stdout, stderr = self.execute_command(host, port, username, password, command)
             
             if success:
+                self.invalidate(host, port, username, path)
                 return True, f"Deleted: {path}"
             else:
                 return False, f"Delete failed: {stderr}"
@@ -288,6 +672,7 @@ class SFTPClient:
             success, stdout, stderr = self.execute_command(host, port, username, password, command)
             
             if success:
+                self.invalidate(host, port, username, path)
                 return True, f"Deleted directory: {path}"
             else:
                 return False, f"Delete directory failed: {stderr}"
@@ -329,3 +714,24 @@ class SFTPClient:
             
         except Exception as e:
             return False, f"Get file info error: {e}"
+    
+    def close(self, host, port, username):
+        """Shut down the shared SSH connection to host, if one is open"""
+        with self._session_lock:
+            session = self._sessions.pop((host, str(port), username), None)
+        if session is not None:
+            session[0].close()
+            return
+        if not _is_openssh():
+            return
+        
+        try:
+            subprocess.run(
+                ["ssh", "-o", f"ControlPath={CONTROL_PATH}", "-O", "exit",
+                 "-p", str(port), f"{username}@{host}"],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                timeout=5
+            )
+        except Exception:
+            pass
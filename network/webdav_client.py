@@ -1,13 +1,106 @@
 import subprocess
 import os
+import shutil
+import base64
+import threading
+import io
+import http.client
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import quote, unquote, urlsplit
 from ..constants import DEFAULT_TIMEOUT
 from ..exceptions import RemoteConnectionError, NetworkError
 from ..utils.validators import validate_url, sanitize_string
+from ..utils.listing_cache import ListingCache
+
+try:
+    from lxml import etree as ET
+except ImportError:
+    import xml.etree.ElementTree as ET
+
+_DAV = '{DAV:}'
+
+LISTING_CACHE_SIZE = 64
+LISTING_CACHE_TTL = 30  # seconds
+
+class HTTPConnectionPool:
+    """Keep-alive HTTP(S) connections to one server, reused across requests"""
+    
+    def __init__(self, scheme, host, port=None, maxsize=4, timeout=DEFAULT_TIMEOUT):
+        self.scheme = scheme
+        self.host = host
+        self.port = port
+        self.maxsize = maxsize
+        self.timeout = timeout
+        self._idle = []
+        self._lock = threading.Lock()
+    
+    def _acquire(self):
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        conn_class = http.client.HTTPSConnection if self.scheme == 'https' else http.client.HTTPConnection
+        return conn_class(self.host, self.port, timeout=self.timeout)
+    
+    def _release(self, conn):
+        with self._lock:
+            if len(self._idle) < self.maxsize:
+                self._idle.append(conn)
+                return
+        conn.close()
+    
+    @staticmethod
+    def _send(conn, method, path, headers, body):
+        conn.request(method, path, body=body, headers=headers)
+        resp = conn.getresponse()
+        return resp.status, resp.read()
+    
+    def request(self, method, path, headers=None, body=None):
+        """Send a request on a pooled connection; returns (status, body bytes)"""
+        headers = headers or {}
+        conn = self._acquire()
+        try:
+            try:
+                status, data = self._send(conn, method, path, headers, body)
+            except (http.client.HTTPException, ConnectionError):
+                # Server closed the idle keep-alive connection; retry on a fresh one
+                conn.close()
+                status, data = self._send(conn, method, path, headers, body)
+        except Exception:
+            conn.close()
+            raise
+        self._release(conn)
+        return status, data
+    
+    def close(self):
+        """Close all idle connections"""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
 
 class WebDAVClient:
     def __init__(self, config):
         self.config = config
         self.timeout = DEFAULT_TIMEOUT
+        # Resolved once; looked up again only while still missing
+        self._curl = shutil.which("curl")
+        # Local directories already created (or found) by downloads
+        self._mkdir_cache = set()
+        # (url, username, depth) -> (timestamp, entries)
+        self._dir_cache = ListingCache(LISTING_CACHE_SIZE, LISTING_CACHE_TTL, copy_entry=dict)
+    
+    def _ensure_local_dir(self, local_path):
+        """Create the parent directory of local_path once per client"""
+        local_dir = os.path.dirname(local_path)
+        if local_dir and local_dir not in self._mkdir_cache:
+            os.makedirs(local_dir, exist_ok=True)
+            self._mkdir_cache.add(local_dir)
+    
+    def invalidate(self, url):
+        """Drop cached listings of a URL and its parent collection (call after writes)"""
+        url = url.rstrip('/')
+        parent = url.rsplit('/', 1)[0]
+        self._dir_cache.discard_where(lambda key: key[0] in (url, parent))
     
     def test_connection(self, url, username="", password=""):
         """Test WebDAV connection using curl"""
@@ -15,12 +108,9 @@ class WebDAVClient:
             validate_url(url)
             
             # Check if curl is available
-            curl_check = subprocess.run(
-                ["which", "curl"],
-                capture_output=True,
-                timeout=5
-            )
-            if curl_check.returncode != 0:
+            if self._curl is None:
+                self._curl = shutil.which("curl")
+            if self._curl is None:
                 return False, "curl not installed. Install with: opkg install curl"
             
             # Build curl command
@@ -55,9 +145,7 @@ class WebDAVClient:
             validate_url(url)
             
             # Create local directory if it doesn't exist
-            local_dir = os.path.dirname(local_path)
-            if local_dir and not os.path.exists(local_dir):
-                os.makedirs(local_dir, exist_ok=True)
+            self._ensure_local_dir(local_path)
             
             # Build curl command
             curl_cmd = ["curl", "-s", "-o", local_path]
@@ -84,6 +172,22 @@ class WebDAVClient:
         except Exception as e:
             return False, f"Download error: {e}"
     
+    def bulk_download(self, pairs, username="", password="", max_workers=4):
+        """Download (url, local_path) pairs concurrently
+        
+        Returns {(url, local_path): (success, message)}, e.g. for files
+        found by list_directory. Repeated pairs are downloaded once.
+        """
+        def download_one(pair):
+            url, local_path = pair
+            return self.download_file(url, local_path, username, password)
+        
+        # Materialize once: iterators would be used up by map before zip
+        pairs = list(dict.fromkeys(pairs))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(download_one, pairs))
+        return dict(zip(pairs, results))
+    
     def upload_file(self, local_path, url, username="", password=""):
         """Upload file to WebDAV"""
         try:
@@ -108,6 +212,7 @@ class WebDAVClient:
             )
             
             if result.returncode == 0:
+                self.invalidate(url)
                 return True, f"Uploaded to: {url}"
             else:
                 return False, f"Upload failed: {result.stderr[:100]}"
@@ -117,11 +222,37 @@ class WebDAVClient:
         except Exception as e:
             return False, f"Upload error: {e}"
     
-    def list_directory(self, url, username="", password="", depth=1):
-        """List WebDAV directory contents"""
+    def list_directory(self, url, username="", password="", depth=1, session=None):
+        """List WebDAV directory contents
+        
+        With session (an HTTPConnectionPool for the server) the PROPFIND
+        reuses a keep-alive connection instead of spawning curl.
+        """
         try:
             validate_url(url)
             
+            key = (url.rstrip('/'), username, depth)
+            cached = self._dir_cache.get(key)
+            if cached is not None:
+                return True, cached
+            
+            if session is not None:
+                parts = urlsplit(url)
+                headers = {'Depth': str(depth)}
+                if username:
+                    token = base64.b64encode(f"{username}:{password}".encode('utf-8')).decode('ascii')
+                    headers['Authorization'] = f"Basic {token}"
+                request_path = parts.path or '/'
+                if parts.query:
+                    request_path += '?' + parts.query
+                
+                status, body = session.request('PROPFIND', request_path, headers)
+                if status >= 400:
+                    return False, f"List failed: HTTP {status}"
+                entries = self._parse_listing(body, url)
+                self._dir_cache.set(key, entries)
+                return True, entries
+            
             # Build curl command for PROPFIND
             curl_cmd = ["curl", "-s", "-X", "PROPFIND", "--header", f"Depth: {depth}"]
             
@@ -130,46 +261,18 @@ class WebDAVClient:
             
             curl_cmd.extend(["--connect-timeout", "10", url])
             
+            # Raw bytes: the XML parser decodes per the document's own declaration
             result = subprocess.run(
                 curl_cmd,
                 capture_output=True,
-                timeout=15,
-                text=True
+                timeout=15
             )
             
             if result.returncode != 0:
-                return False, f"List failed: {result.stderr[:100]}"
-            
-            # Parse XML response (simplified)
-            entries = []
-            lines = result.stdout.split('\n')
-            
-            for line in lines:
-                if '<d:href>' in line:
-                    # Extract path
-                    start = line.find('<d:href>') + 8
-                    end = line.find('</d:href>')
-                    if start < end:
-                        href = line[start:end]
-                        # Remove URL base
-                        if href.startswith(url):
-                            href = href[len(url):]
-                        
-                        if href and href != '/':
-                            # Check if it's a collection (directory)
-                            is_dir = False
-                            if '</d:collection>' in line or 'collection' in line.lower():
-                                is_dir = True
-                            
-                            name = href.rstrip('/').split('/')[-1]
-                            
-                            entries.append({
-                                'name': name,
-                                'path': href,
-                                'is_dir': is_dir,
-                                'url': url.rstrip('/') + href
-                            })
+                return False, f"List failed: {result.stderr[:100].decode('utf-8', 'replace')}"
             
+            entries = self._parse_listing(result.stdout, url)
+            self._dir_cache.set(key, entries)
             return True, entries
             
         except subprocess.TimeoutExpired:
@@ -177,6 +280,37 @@ class WebDAVClient:
         except Exception as e:
             return False, f"List directory error: {e}"
     
+    @staticmethod
+    def _parse_listing(body, url):
+        """Parse a PROPFIND multistatus body (bytes) into entry dicts"""
+        entries = []
+        base_url = url.rstrip('/')
+        base_path = unquote(urlsplit(url).path).rstrip('/')
+        
+        # Stream the responses, dropping each one once parsed
+        for _, elem in ET.iterparse(io.BytesIO(body), events=('end',)):
+            if elem.tag != _DAV + 'response':
+                continue
+            
+            href = unquote(urlsplit(elem.findtext(_DAV + 'href') or '').path)
+            # Remove URL base
+            if href.startswith(base_path):
+                href = href[len(base_path):]
+            
+            # Skip the collection itself
+            if href and href != '/':
+                size = elem.findtext('.//' + _DAV + 'getcontentlength')
+                entries.append({
+                    'name': href.rstrip('/').split('/')[-1],
+                    'path': href,
+                    'is_dir': elem.find('.//' + _DAV + 'resourcetype/' + _DAV + 'collection') is not None,
+                    'size': int(size) if size and size.isdigit() else 0,
+                    'url': base_url + quote(href)
+                })
+            elem.clear()
+        
+        return entries
+    
     def create_directory(self, url, username="", password=""):
         """Create directory on WebDAV"""
         try:
@@ -198,6 +332,7 @@ class WebDAVClient:
             )
             
             if result.returncode == 0 or "405" in result.stdout:  # 405 = Already exists
+                self.invalidate(url)
                 return True, f"Created directory: {url}"
             else:
                 return False, f"Create directory failed: {result.stderr[:100]}"
@@ -228,6 +363,7 @@ class WebDAVClient:
             )
             
             if result.returncode == 0:
+                self.invalidate(url)
                 return True, f"Deleted: {url}"
             else:
                 return False, f"Delete failed: {result.stderr[:100]}"
@@ -60,7 +60,7 @@ __all__ = [
 
 # Version info for player module
 PLAYER_VERSION = "1.1.0"
-PLAYER_FEATURES = [
+PLAYER_FEATURES = (
     "Play/pause with subtitle sync",
     "Audio track selection",
     "Signal monitor",
@@ -69,14 +69,17 @@ PLAYER_FEATURES = [
     "Subtitle delay adjustment",
     "Multi-format subtitle support",
     "Auto-load subtitles",
-]
+)
+
+# Built once; callers that need to modify it should copy it first
+_PLAYER_INFO = {
+    'version': PLAYER_VERSION,
+    'features': PLAYER_FEATURES,
+    'subtitle_formats': ('SRT', 'SUB', 'ASS/SSA', 'VTT'),
+    'audio_formats': ('MP3', 'AAC', 'AC3', 'DTS', 'FLAC', 'WAV'),
+    'video_formats': ('MP4', 'MKV', 'AVI', 'TS', 'M2TS', 'MOV'),
+}
 
 def get_player_info():
     """Get information about the player module"""
-    return {
-        'version': PLAYER_VERSION,
-        'features': PLAYER_FEATURES,
-        'subtitle_formats': ['SRT', 'SUB', 'ASS/SSA', 'VTT'],
-        'audio_formats': ['MP3', 'AAC', 'AC3', 'DTS', 'FLAC', 'WAV'],
-        'video_formats': ['MP4', 'MKV', 'AVI', 'TS', 'M2TS', 'MOV'],
-    }
\ No newline at end of file
+    return _PLAYER_INFO
@@ -4,6 +4,7 @@ Connects keymap.xml actions to player methods with subtitle support
 """
 
 import logging
+from functools import partial
 
 try:
     from ..utils.logging_config import get_logger
@@ -13,6 +14,14 @@ except ImportError:
     logger = logging.getLogger(__name__)
 
 
+def _action(player, name, *args):
+    """Bind player.name(*args) once; methods the player lacks stay late-bound"""
+    method = getattr(player, name, None)
+    if method is None:
+        return lambda: getattr(player, name)(*args)
+    return partial(method, *args) if args else method
+
+
 def setup_player_actions(player):
     """
     Setup complete action map for player with subtitle support
@@ -30,32 +39,32 @@ def setup_player_actions(player):
         'open_subtitle_menu': player.open_subtitle_menu,
         'open_subtitle_settings': player.open_subtitle_menu,
         'showSubtitleMenu': player.open_subtitle_menu,
-        'open_subtitle_tools': lambda: player.open_subtitle_menu(),
+        'open_subtitle_tools': player.open_subtitle_menu,
         'subtitle_toggle_quick': player.toggle_subtitle,
         'subtitle_settings_quick': player.open_subtitle_menu,
         
         # Quick delay adjustments
-        'subtitle_delay_minus_5': lambda: player.adjust_subtitle_delay(-5000),
-        'subtitle_delay_minus_1': lambda: player.adjust_subtitle_delay(-1000),
-        'subtitle_delay_minus_01': lambda: player.adjust_subtitle_delay(-100),
-        'subtitle_delay_plus_01': lambda: player.adjust_subtitle_delay(100),
-        'subtitle_delay_plus_1': lambda: player.adjust_subtitle_delay(1000),
-        'subtitle_delay_plus_5': lambda: player.adjust_subtitle_delay(5000),
+        'subtitle_delay_minus_5': _action(player, 'adjust_subtitle_delay', -5000),
+        'subtitle_delay_minus_1': _action(player, 'adjust_subtitle_delay', -1000),
+        'subtitle_delay_minus_01': _action(player, 'adjust_subtitle_delay', -100),
+        'subtitle_delay_plus_01': _action(player, 'adjust_subtitle_delay', 100),
+        'subtitle_delay_plus_1': _action(player, 'adjust_subtitle_delay', 1000),
+        'subtitle_delay_plus_5': _action(player, 'adjust_subtitle_delay', 5000),
         
         # Subtitle style
-        'toggle_subtitle_style': lambda: player.cycle_subtitle_style(),
-        'toggle_subtitle_position': lambda: player.cycle_subtitle_position(),
-        'cycle_font_size': lambda: player.cycle_font_size(),
-        'cycle_font_color': lambda: player.cycle_font_color(),
-        'cycle_subtitle_encoding': lambda: player.cycle_subtitle_encoding(),
-        'cycle_subtitle_track': lambda: player.cycle_subtitle_track(),
+        'toggle_subtitle_style': _action(player, 'cycle_subtitle_style'),
+        'toggle_subtitle_position': _action(player, 'cycle_subtitle_position'),
+        'cycle_font_size': _action(player, 'cycle_font_size'),
+        'cycle_font_color': _action(player, 'cycle_font_color'),
+        'cycle_subtitle_encoding': _action(player, 'cycle_subtitle_encoding'),
+        'cycle_subtitle_track': _action(player, 'cycle_subtitle_track'),
         
         # ===== AUDIO ACTIONS =====
         'audio_menu': player.audio_menu_fixed,
         'audio_selection': player.audio_menu_fixed,
-        'long_audio': lambda: player.seek_relative(-30),  # Jump back 30s
-        'quick_jump_back': lambda: player.seek_relative(-30),
-        'cycle_audio_track': lambda: player.cycle_audio_track(),
+        'long_audio': _action(player, 'seek_relative', -30),  # Jump back 30s
+        'quick_jump_back': _action(player, 'seek_relative', -30),
+        'cycle_audio_track': _action(player, 'cycle_audio_track'),
         
         # ===== PLAYBACK CONTROLS =====
         'play_pause': player.play_pause_fixed,
@@ -63,80 +72,80 @@ def setup_player_actions(player):
         'stop': player.stop,
         
         # ===== SEEK CONTROLS =====
-        'seek_forward': lambda: player.seek_relative(10),    # +10 seconds
-        'seek_backward': lambda: player.seek_relative(-10),  # -10 seconds
-        'seek_forward_10': lambda: player.seek_relative(30),  # +30 seconds
-        'seek_backward_10': lambda: player.seek_relative(-30), # -30 seconds
-        'seek_forward_fast': lambda: player.seek_relative(60), # +1 minute
-        'seek_backward_fast': lambda: player.seek_relative(-60), # -1 minute
-        'fast_forward': lambda: player.seek_relative(60),
-        'rewind': lambda: player.seek_relative(-60),
+        'seek_forward': _action(player, 'seek_relative', 10),    # +10 seconds
+        'seek_backward': _action(player, 'seek_relative', -10),  # -10 seconds
+        'seek_forward_10': _action(player, 'seek_relative', 30),  # +30 seconds
+        'seek_backward_10': _action(player, 'seek_relative', -30), # -30 seconds
+        'seek_forward_fast': _action(player, 'seek_relative', 60), # +1 minute
+        'seek_backward_fast': _action(player, 'seek_relative', -60), # -1 minute
+        'fast_forward': _action(player, 'seek_relative', 60),
+        'rewind': _action(player, 'seek_relative', -60),
         
         # ===== CHANNEL CONTROLS =====
         'channel_up': player.channel_up_fixed,
         'channel_down': player.channel_down_fixed,
-        'next': lambda: player.next_file(),
-        'previous': lambda: player.previous_file(),
-        'next_file': lambda: player.next_file(),
-        'previous_file': lambda: player.previous_file(),
+        'next': _action(player, 'next_file'),
+        'previous': _action(player, 'previous_file'),
+        'next_file': _action(player, 'next_file'),
+        'previous_file': _action(player, 'previous_file'),
         
         # ===== INFO & SIGNAL =====
         'show_signal_monitor': player.show_signal_monitor_fixed,
         'signal_monitor': player.show_signal_monitor_fixed,
         'show_info': player.show_signal_monitor_fixed,
-        'show_extended_info': lambda: player.show_extended_info(),
+        'show_extended_info': _action(player, 'show_extended_info'),
         
         # ===== CUTLIST & CATCHUP =====
         'show_cutlist': player.show_cutlist_fixed,
         'show_catchup': player.show_catchup_fixed,
-        'mark_in_point': lambda: player.mark_position("in"),
-        'mark_out_point': lambda: player.mark_position("out"),
+        'mark_in_point': _action(player, 'mark_position', "in"),
+        'mark_out_point': _action(player, 'mark_position', "out"),
         
         # ===== SERVICE MANAGEMENT =====
         'refresh_service': player.refresh_service_fixed,
         
         # ===== PLAYER UI =====
-        'show_player_bar': lambda: player.toggle_player_bar(),
-        'toggle_fullscreen': lambda: player.toggle_fullscreen(),
-        'toggle_infobar': lambda: player.toggle_info_bar(),
-        'open_player_menu': lambda: player.open_player_menu(),
-        'open_player_settings': lambda: player.open_player_settings(),
+        'show_player_bar': _action(player, 'toggle_player_bar'),
+        'toggle_fullscreen': _action(player, 'toggle_fullscreen'),
+        'toggle_infobar': _action(player, 'toggle_info_bar'),
+        'open_player_menu': _action(player, 'open_player_menu'),
+        'open_player_settings': _action(player, 'open_player_settings'),
         
         # ===== JUMP & CHAPTERS =====
-        'open_jump_menu': lambda: player.open_jump_menu(),
-        'open_chapter_menu': lambda: player.open_chapter_menu(),
+        'open_jump_menu': _action(player, 'open_jump_menu'),
+        'open_chapter_menu': _action(player, 'open_chapter_menu'),
         
         # ===== VOLUME =====
-        'volume_up': lambda: player.adjust_volume(5),
-        'volume_down': lambda: player.adjust_volume(-5),
-        'toggle_mute': lambda: player.toggle_mute(),
+        'volume_up': _action(player, 'adjust_volume', 5),
+        'volume_down': _action(player, 'adjust_volume', -5),
+        'toggle_mute': _action(player, 'toggle_mute'),
         
         # ===== ASPECT RATIO & ZOOM =====
-        'toggle_aspect_ratio': lambda: player.toggle_aspect_ratio(),
-        'toggle_zoom': lambda: player.toggle_zoom(),
+        'toggle_aspect_ratio': _action(player, 'toggle_aspect_ratio'),
+        'toggle_zoom': _action(player, 'toggle_zoom'),
         
         # ===== RECORDING =====
-        'toggle_record': lambda: player.toggle_record(),
-        'open_recording_menu': lambda: player.open_recording_menu(),
-        'toggle_timeshift': lambda: player.toggle_timeshift(),
+        'toggle_record': _action(player, 'toggle_record'),
+        'open_recording_menu': _action(player, 'open_recording_menu'),
+        'toggle_timeshift': _action(player, 'toggle_timeshift'),
         
         # ===== EPG & TELEVISION =====
-        'show_epg': lambda: player.show_epg(),
-        'switch_tv_radio': lambda: player.switch_tv_radio(),
-        'toggle_teletext': lambda: player.toggle_teletext(),
+        'show_epg': _action(player, 'show_epg'),
+        'switch_tv_radio': _action(player, 'switch_tv_radio'),
+        'toggle_teletext': _action(player, 'toggle_teletext'),
         
         # ===== BOOKMARKS & SCREENSHOTS =====
-        'toggle_bookmark': lambda: player.toggle_bookmark(),
-        'take_screenshot': lambda: player.take_screenshot(),
+        'toggle_bookmark': _action(player, 'toggle_bookmark'),
+        'take_screenshot': _action(player, 'take_screenshot'),
         
         # ===== PLAYLIST & REPEAT =====
-        'show_playlist': lambda: player.show_playlist(),
-        'toggle_repeat': lambda: player.toggle_repeat(),
-        'toggle_slow_motion': lambda: player.toggle_slow_motion(),
+        'show_playlist': _action(player, 'show_playlist'),
+        'toggle_repeat': _action(player, 'toggle_repeat'),
+        'toggle_slow_motion': _action(player, 'toggle_slow_motion'),
         
         # ===== FRAME ADVANCE & ANGLES =====
-        'frame_advance': lambda: player.frame_advance(),
-        'cycle_angle': lambda: player.cycle_angle(),
+        'frame_advance': _action(player, 'frame_advance'),
+        'cycle_angle': _action(player, 'cycle_angle'),
     }
     
     logger.info(f"Created action map with {len(action_map)} actions")
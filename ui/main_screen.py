@@ -1947,6 +1947,10 @@ class WGFileManagerMain(Screen):
             with self.operation_lock:
                 self.operation_in_progress = False
             
+            # Persist last_used times kept in memory by connection tests
+            if hasattr(self, 'remote_mgr'):
+                self.remote_mgr.flush()
+            
             logger.info("[MainScreen] Cleanup completed")
         except Exception as e:
             logger.error(f"[MainScreen] Cleanup error: {e}")
@@ -27,6 +27,9 @@ from .security import (
 # Logging
 from .logging_config import get_logger, setup_logging
 
+# Listing cache
+from .listing_cache import ListingCache
+
 # Subtitle Utilities (new)
 try:
     from .subtitle_utils import (
@@ -208,6 +211,9 @@ __all__ = [
     # Logging
     'get_logger', 'setup_logging',
     
+    # Listing cache
+    'ListingCache',
+    
     # Subtitle Utilities
     'detect_subtitle_encoding',
     'get_matching_subtitle_files',
@@ -0,0 +1,73 @@
+import threading
+import time
+from collections import OrderedDict
+
+class ListingCache:
+    """Thread-safe LRU cache of directory listings that expire after ttl seconds
+    
+    Listings are frozen as tuples when stored; get() hands out a new list,
+    with each entry passed through copy_entry (e.g. dict) when given, so
+    callers cannot change what is cached.
+    """
+    
+    def __init__(self, maxsize, ttl, copy_entry=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.copy_entry = copy_entry
+        # key -> (timestamp, entries)
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def _fresh(self, key):
+        """Return the cached tuple for key, dropping it if expired (lock held)"""
+        cached = self._data.get(key)
+        if cached is None:
+            return None
+        if time.monotonic() - cached[0] >= self.ttl:
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return cached[1]
+    
+    def get(self, key):
+        """Return a copy of the listing cached under key, or None"""
+        with self._lock:
+            entries = self._fresh(key)
+        if entries is None:
+            return None
+        if self.copy_entry is None:
+            return list(entries)
+        return [self.copy_entry(entry) for entry in entries]
+    
+    def __contains__(self, key):
+        with self._lock:
+            return self._fresh(key) is not None
+    
+    def set(self, key, entries):
+        """Cache a listing; stored as a tuple of copied entries"""
+        if self.copy_entry is not None:
+            entries = tuple(self.copy_entry(entry) for entry in entries)
+        else:
+            entries = tuple(entries)
+        with self._lock:
+            self._data[key] = (time.monotonic(), entries)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+    
+    def discard(self, *keys):
+        """Drop the listings cached under keys"""
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+    
+    def discard_where(self, predicate):
+        """Drop every listing whose key satisfies predicate(key)"""
+        with self._lock:
+            for key in [k for k in self._data if predicate(k)]:
+                del self._data[key]
+    
+    def clear(self):
+        """Drop all cached listings"""
+        with self._lock:
+            self._data.clear()
@@ -1,6 +1,10 @@
 import os
 import re
 import shlex
+from functools import lru_cache
+
+_HOSTNAME_RE = re.compile(r'^[a-zA-Z0-9]([a-zA-Z0-9\-]{0,61}[a-zA-Z0-9])?(\.[a-zA-Z0-9]([a-zA-Z0-9\-]{0,61}[a-zA-Z0-9])?)*$')
+_URL_RE = re.compile(r'^(https?|ftp|file)://.+')
 
 def validate_path(path, must_exist=False, must_be_dir=False, must_be_file=False, is_filename=False):
     """
@@ -107,31 +111,47 @@ def validate_ip(ip_address):
     
     return True
 
+# Remote clients validate the same few hosts/URLs/ports on every call;
+# the checks are pure, so results are memoized. The public wrappers
+# type-check first so unhashable arguments fail validation instead of
+# raising TypeError from the cache.
+@lru_cache(maxsize=256)
+def _validate_hostname(hostname):
+    return bool(_HOSTNAME_RE.match(hostname)) and len(hostname) <= 255
+
+@lru_cache(maxsize=256)
+def _validate_url(url):
+    return bool(_URL_RE.match(url))
+
+@lru_cache(maxsize=256)
+def _validate_port(port):
+    try:
+        port_num = int(port)
+        return 1 <= port_num <= 65535
+    except (ValueError, TypeError):
+        return False
+
 def validate_hostname(hostname):
     """Validate hostname"""
     if not hostname or not isinstance(hostname, str):
         return False
     
-    pattern = r'^[a-zA-Z0-9]([a-zA-Z0-9\-]{0,61}[a-zA-Z0-9])?(\.[a-zA-Z0-9]([a-zA-Z0-9\-]{0,61}[a-zA-Z0-9])?)*$'
-    
-    return bool(re.match(pattern, hostname)) and len(hostname) <= 255
+    return _validate_hostname(hostname)
 
 def validate_url(url):
     """Validate URL"""
     if not url or not isinstance(url, str):
         return False
     
-    pattern = r'^(https?|ftp|file)://.+'
-    
-    return bool(re.match(pattern, url))
+    return _validate_url(url)
 
 def validate_port(port):
     """Validate port number"""
-    try:
-        port_num = int(port)
-        return 1 <= port_num <= 65535
-    except (ValueError, TypeError):
-        return False
+    if not isinstance(port, (int, str)):
+        # Rare non-int/str values are checked without the cache
+        return _validate_port.__wrapped__(port)
+    
+    return _validate_port(port)
 
 def sanitize_string(text, max_length=255, allow_special=False):
     """